@@ -7,4 +7,8 @@ class ForensicInvestigationViewSet(viewsets.ModelViewSet):
     queryset = ForensicInvestigation.objects.all()
     permission_classes = [IsAuthenticated, IsAuditor]
     
+    def get_queryset(self):
+        # fraud_case is read by __str__ and investigator by any serializer; join both up front
+        return ForensicInvestigation.objects.select_related('fraud_case', 'investigator')
+    
     # Add serializers and methods as needed
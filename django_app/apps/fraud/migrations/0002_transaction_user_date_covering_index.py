@@ -0,0 +1,24 @@
+# Generated by Django 5.0.1 on 2026-10-15 09:12
+
+from django.contrib.postgres.operations import AddIndexConcurrently, RemoveIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('fraud', '0001_initial'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='transaction',
+            index=models.Index(fields=['user_id', '-transaction_date'], include=['country'], name='tx_user_date_desc_idx'),
+        ),
+        RemoveIndexConcurrently(
+            model_name='transaction',
+            name='transaction_user_id_285faf_idx',
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.0.1 on 2026-10-15 10:04
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('fraud', '0002_transaction_user_date_covering_index'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='transaction',
+            index=models.Index(fields=['transaction_date', 'fraud_score'], name='txn_date_score_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='transaction',
+            index=models.Index(fields=['status', 'created_at', 'fraud_score'], name='txn_cleanup_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='transaction',
+            index=models.Index(condition=models.Q(('fraud_score__gte', 0.5)), fields=['transaction_date'], name='txn_flagged_partial'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.0.1 on 2026-10-15 11:30
+
+from django.contrib.postgres.operations import AddIndexConcurrently, RemoveIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('fraud', '0003_transaction_report_cleanup_indexes'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='transaction',
+            index=models.Index(condition=models.Q(('fraud_score__lt', 0.3), ('status', 'APPROVED')), fields=['created_at'], name='txn_cleanup_candidates'),
+        ),
+        RemoveIndexConcurrently(
+            model_name='transaction',
+            name='txn_cleanup_idx',
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.0.1 on 2026-10-15 12:15
+
+import django.core.serializers.json
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fraud', '0004_transaction_cleanup_partial_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='alert',
+            name='metadata',
+            field=models.JSONField(default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder),
+        ),
+    ]
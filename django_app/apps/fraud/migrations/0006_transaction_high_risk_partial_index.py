@@ -0,0 +1,20 @@
+# Generated by Django 5.0.1 on 2026-10-15 14:20
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('fraud', '0005_alert_metadata_encoder'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='transaction',
+            index=models.Index(models.OrderBy(models.F('fraud_score'), descending=True), condition=models.Q(('risk_level__in', ['HIGH', 'CRITICAL'])), name='txn_high_risk_score_idx'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.0.1 on 2026-10-15 15:05
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('fraud', '0006_transaction_high_risk_partial_index'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='transaction',
+            index=models.Index(fields=['created_at', 'fraud_score'], name='txn_created_score_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='fraudcase',
+            index=models.Index(fields=['resolved_at'], name='case_resolved_at_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='fraudcase',
+            index=models.Index(fields=['created_at'], name='case_created_at_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='alert',
+            index=models.Index(fields=['created_at', 'severity'], name='alert_created_severity_idx'),
+        ),
+    ]
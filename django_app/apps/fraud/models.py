@@ -1,5 +1,8 @@
 from django.db import models
+from django.db.models import Q, Value
+from django.db.models.functions import Coalesce, Concat, NullIf, Trim
 from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
 from common.constants import FraudStatus, AlertSeverity, TransactionStatus, RiskLevel
 from decimal import Decimal
 
@@ -40,9 +43,27 @@ class Transaction(models.Model):
         db_table = 'transactions'
         ordering = ['-transaction_date']
         indexes = [
-            models.Index(fields=['user_id', '-transaction_date']),
+            # Covers country so the velocity/location rules can use index-only scans
+            models.Index(fields=['user_id', '-transaction_date'], include=['country'], name='tx_user_date_desc_idx'),
             models.Index(fields=['status', 'risk_level']),
             models.Index(fields=['fraud_score']),
+            models.Index(fields=['transaction_date', 'fraud_score'], name='txn_date_score_idx'),
+            # Dashboard window aggregates can run as index-only scans
+            models.Index(fields=['created_at', 'fraud_score'], name='txn_created_score_idx'),
+            # Serves the high_risk listing's ORDER BY fraud_score DESC from the index tip
+            models.Index(
+                models.F('fraud_score').desc(),
+                condition=Q(risk_level__in=[RiskLevel.HIGH, RiskLevel.CRITICAL]),
+                name='txn_high_risk_score_idx',
+            ),
+            # Approved low-score rows eligible for cleanup_old_transactions
+            models.Index(
+                fields=['created_at'],
+                condition=Q(status=TransactionStatus.APPROVED, fraud_score__lt=0.3),
+                name='txn_cleanup_candidates',
+            ),
+            # Flagged rows are a small slice of the table; used by the daily report
+            models.Index(fields=['transaction_date'], condition=Q(fraud_score__gte=0.5), name='txn_flagged_partial'),
         ]
     
     def __str__(self):
@@ -90,13 +111,20 @@ class FraudCase(models.Model):
         indexes = [
             models.Index(fields=['status', 'severity']),
             models.Index(fields=['assigned_to', 'status']),
+            models.Index(fields=['resolved_at'], name='case_resolved_at_idx'),
+            models.Index(fields=['created_at'], name='case_created_at_idx'),
         ]
     
     def __str__(self):
         return f"{self.case_number} - {self.title}"
 
 class Alert(models.Model):
-    """Real-time fraud alerts triggered by ML model."""
+    """
+    Real-time fraud alerts triggered by ML model.
+    
+    The acknowledgement columns and case are the only ones updated after insert;
+    triggered_rules and metadata are written once, so updates should pass update_fields.
+    """
     alert_id = models.CharField(max_length=100, unique=True, db_index=True)
     transaction = models.ForeignKey(Transaction, on_delete=models.CASCADE, related_name='alerts')
     
@@ -106,7 +134,7 @@ class Alert(models.Model):
     
     # Alert details
     triggered_rules = models.JSONField(default=list)  # List of rules that triggered the alert
-    metadata = models.JSONField(default=dict)
+    metadata = models.JSONField(default=dict, encoder=DjangoJSONEncoder)
     
     # Status
     is_acknowledged = models.BooleanField(default=False)
@@ -130,6 +158,7 @@ class Alert(models.Model):
         indexes = [
             models.Index(fields=['severity', '-created_at']),
             models.Index(fields=['is_acknowledged']),
+            models.Index(fields=['created_at', 'severity'], name='alert_created_severity_idx'),
         ]
     
     def __str__(self):
@@ -168,6 +197,21 @@ class FraudPattern(models.Model):
             return 0.0
         return (self.true_positive_count / total) * 100
 
+class CaseNoteQuerySet(models.QuerySet):
+    def with_author_name(self):
+        """Annotate author_full_name: "first last", falling back to email, then 'Unknown'."""
+        return self.select_related('author').annotate(
+            author_full_name=Coalesce(
+                NullIf(
+                    Trim(Concat('author__first_name', Value(' '), 'author__last_name', output_field=models.CharField())),
+                    Value('')
+                ),
+                'author__email',
+                Value('Unknown'),
+                output_field=models.CharField()
+            )
+        )
+
 class CaseNote(models.Model):
     """Investigation notes and case updates."""
     case = models.ForeignKey(FraudCase, on_delete=models.CASCADE, related_name='notes')
@@ -176,6 +220,8 @@ class CaseNote(models.Model):
     is_internal = models.BooleanField(default=True)  # Internal vs customer-facing
     created_at = models.DateTimeField(auto_now_add=True)
     
+    objects = CaseNoteQuerySet.as_manager()
+    
     class Meta:
         db_table = 'case_notes'
         ordering = ['-created_at']
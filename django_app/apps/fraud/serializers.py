@@ -2,13 +2,24 @@ from rest_framework import serializers
 from django.contrib.auth import get_user_model
 from .models import Transaction, FraudCase, Alert, FraudPattern, CaseNote
 from apps.users.serializers import UserSerializer
+from common.constants import AlertSeverity, FraudStatus, RiskLevel, TransactionStatus
 
 User = get_user_model()
 
+class ChoiceDisplayField(serializers.ReadOnlyField):
+    """Render a choice value's label from a dict built once, instead of get_FOO_display per row."""
+    
+    def __init__(self, choices, **kwargs):
+        self.labels = dict(choices)
+        super().__init__(**kwargs)
+    
+    def to_representation(self, value):
+        return self.labels.get(value, value)
+
 class TransactionSerializer(serializers.ModelSerializer):
     """Serializer for transaction listing and details."""
-    risk_level_display = serializers.CharField(source='get_risk_level_display', read_only=True)
-    status_display = serializers.CharField(source='get_status_display', read_only=True)
+    risk_level_display = ChoiceDisplayField(RiskLevel.choices, source='risk_level')
+    status_display = ChoiceDisplayField(TransactionStatus.choices, source='status')
     
     class Meta:
         model = Transaction
@@ -53,16 +64,21 @@ class TransactionDetailSerializer(TransactionSerializer):
         fields = TransactionSerializer.Meta.fields + ['alerts', 'fraud_cases', 'ml_features']
     
     def get_alerts(self, obj):
-        alerts = obj.alerts.all()[:5]
+        # Use the viewset's Prefetch(to_attr=...) when present, query otherwise
+        alerts = getattr(obj, 'prefetched_alerts', None)
+        if alerts is None:
+            alerts = obj.alerts.select_related('transaction', 'acknowledged_by')[:5]
         return AlertSerializer(alerts, many=True).data
     
     def get_fraud_cases(self, obj):
-        cases = obj.fraud_cases.all()
+        cases = getattr(obj, 'prefetched_cases', None)
+        if cases is None:
+            cases = obj.fraud_cases.select_related('assigned_to', 'transaction')
         return FraudCaseListSerializer(cases, many=True).data
 
 class AlertSerializer(serializers.ModelSerializer):
     """Serializer for fraud alerts."""
-    severity_display = serializers.CharField(source='get_severity_display', read_only=True)
+    severity_display = ChoiceDisplayField(AlertSeverity.choices, source='severity')
     transaction_reference = serializers.CharField(source='transaction.reference', read_only=True)
     acknowledged_by_email = serializers.EmailField(source='acknowledged_by.email', read_only=True)
     
@@ -83,8 +99,8 @@ class AlertAcknowledgeSerializer(serializers.Serializer):
 
 class FraudCaseListSerializer(serializers.ModelSerializer):
     """Serializer for fraud case listing."""
-    status_display = serializers.CharField(source='get_status_display', read_only=True)
-    severity_display = serializers.CharField(source='get_severity_display', read_only=True)
+    status_display = ChoiceDisplayField(FraudStatus.choices, source='status')
+    severity_display = ChoiceDisplayField(AlertSeverity.choices, source='severity')
     assigned_to_email = serializers.EmailField(source='assigned_to.email', read_only=True)
     transaction_reference = serializers.CharField(source='transaction.reference', read_only=True)
     transaction_amount = serializers.DecimalField(source='transaction.amount', max_digits=15, decimal_places=2, read_only=True)
@@ -115,7 +131,9 @@ class FraudCaseDetailSerializer(FraudCaseListSerializer):
         ]
     
     def get_notes(self, obj):
-        notes = obj.notes.all()[:10]
+        notes = getattr(obj, 'prefetched_notes', None)
+        if notes is None:
+            notes = obj.notes.with_author_name()[:10]
         return CaseNoteSerializer(notes, many=True).data
 
 class FraudCaseCreateSerializer(serializers.ModelSerializer):
@@ -145,17 +163,12 @@ class FraudCaseUpdateSerializer(serializers.ModelSerializer):
 class CaseNoteSerializer(serializers.ModelSerializer):
     """Serializer for case notes."""
     author_email = serializers.EmailField(source='author.email', read_only=True)
-    author_name = serializers.SerializerMethodField()
+    author_name = serializers.CharField(source='author_full_name', read_only=True)
     
     class Meta:
         model = CaseNote
         fields = ['id', 'case', 'author', 'author_email', 'author_name', 'note', 'is_internal', 'created_at']
         read_only_fields = ['id', 'author', 'created_at']
-    
-    def get_author_name(self, obj):
-        if obj.author:
-            return f"{obj.author.first_name} {obj.author.last_name}".strip() or obj.author.email
-        return "Unknown"
 
 class CaseNoteCreateSerializer(serializers.ModelSerializer):
     """Serializer for creating case notes."""
@@ -194,9 +207,21 @@ class BulkTransactionSerializer(serializers.Serializer):
     """Serializer for bulk transaction processing."""
     transactions = TransactionCreateSerializer(many=True)
     
-    def validate_transactions(self, value):
-        if not value:
-            raise serializers.ValidationError("At least one transaction is required")
-        if len(value) > 100:
-            raise serializers.ValidationError("Maximum 100 transactions allowed per batch")
-        return value
+    def to_internal_value(self, data):
+        # Size limits are checked before any item is validated, and reported
+        # as {"transactions": ["..."]} rather than the ListSerializer's nested shape
+        transactions = data.get('transactions') if isinstance(data, dict) else None
+        if isinstance(transactions, list):
+            if not transactions:
+                raise serializers.ValidationError({'transactions': ["At least one transaction is required"]})
+            if len(transactions) > 100:
+                raise serializers.ValidationError({'transactions': ["Maximum 100 transactions allowed per batch"]})
+        return super().to_internal_value(data)
+
+class BulkTransactionStatusSerializer(serializers.Serializer):
+    """Serializer for applying a review decision to several transactions."""
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=1000
+    )
@@ -1,21 +1,83 @@
 import logging
+import time
 import requests
-from typing import Dict, Any, Tuple
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from typing import Dict, Any, List, Tuple
 from decimal import Decimal
-from django.contrib.auth import get_user_model
-from .models import CaseNote
+from bisect import bisect_left
+from collections import Counter, defaultdict
 from datetime import datetime, timedelta
 from django.conf import settings
-from django.contrib.auth import get_user_model
-from django.db import transaction
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Max, Q, Subquery
 from django.utils import timezone
-from .models import Transaction, FraudCase, Alert, FraudPattern
+from .models import Transaction, FraudCase, Alert, FraudPattern, CaseNote
 from common.constants import AlertSeverity, FraudStatus, TransactionStatus, RiskLevel
 from common.exceptions import MLServiceUnavailable, FraudDetectionError
-from common.utils import calculate_fraud_score_locally, generate_transaction_reference, get_risk_level_from_score
+from common.utils import (
+    calculate_fraud_score_locally, generate_transaction_reference, get_risk_level_from_score,
+    invalidate_fraud_stats,
+)
 
 logger = logging.getLogger(__name__)
 
+# Columns written once a transaction has been scored
+SCORE_FIELDS = ['fraud_score', 'risk_level', 'status', 'processed_at']
+
+# Defaults applied to incoming transaction payloads; other keys are ignored
+_TXN_DEFAULTS = {
+    'account_number': '',
+    'currency': 'USD',
+    'transaction_type': 'payment',
+    'merchant_id': '',
+    'merchant_name': '',
+    'merchant_category': '',
+    'ip_address': None,
+    'country': '',
+    'city': '',
+    'device_id': '',
+}
+_TXN_INPUT_FIELDS = frozenset(_TXN_DEFAULTS) | {'transaction_date', 'ml_features'}
+
+# Shared keep-alive session so ML calls reuse pooled connections instead of reconnecting per transaction
+_ML_SESSION = requests.Session()
+_ML_SESSION.mount('http://', HTTPAdapter(pool_connections=32, pool_maxsize=64, max_retries=Retry(total=2, backoff_factor=0.1)))
+_ML_SESSION.mount('https://', HTTPAdapter(pool_connections=32, pool_maxsize=64, max_retries=Retry(total=2, backoff_factor=0.1)))
+
+# Active fraud patterns change rarely; reload them at most once per TTL per process
+PATTERN_CACHE_TTL = 60
+_PATTERN_CACHE = {'ts': 0.0, 'entries': []}
+
+def _compile_pattern(conditions: Dict[str, Any]):
+    """Turn a pattern's conditions into a matcher closure, resolving lookups once."""
+    checks = []
+    
+    if 'amount_range' in conditions:
+        min_amt, max_amt = conditions['amount_range']
+        checks.append(lambda txn: min_amt <= float(txn.amount) <= max_amt)
+    
+    if 'merchant_category' in conditions:
+        categories = frozenset(conditions['merchant_category'])
+        checks.append(lambda txn: txn.merchant_category in categories)
+    
+    if 'countries' in conditions:
+        countries = frozenset(conditions['countries'])
+        checks.append(lambda txn: txn.country in countries)
+    
+    return lambda txn: all(check(txn) for check in checks)
+
+def _get_active_patterns() -> list:
+    """Return (id, name, matcher) for active fraud patterns, refreshing the cache when stale."""
+    now = time.monotonic()
+    if now - _PATTERN_CACHE['ts'] > PATTERN_CACHE_TTL:
+        _PATTERN_CACHE['entries'] = [
+            (pattern.id, pattern.pattern_name, _compile_pattern(pattern.conditions))
+            for pattern in FraudPattern.objects.filter(is_active=True).only('id', 'pattern_name', 'conditions')
+        ]
+        _PATTERN_CACHE['ts'] = now
+    return _PATTERN_CACHE['entries']
+
 class FraudDetectionService:
     """Core fraud detection service that orchestrates ML scoring and rule-based checks."""
     
@@ -36,63 +98,133 @@ class FraudDetectionService:
         5. Update transaction status
         """
         try:
+            # Create transaction (autocommit, stays PENDING until scored)
+            txn = self._create_transaction(transaction_data)
+            
+            # ML call and rule queries run outside any DB transaction so no
+            # connection sits idle-in-transaction while waiting on the ML service
+            fraud_score = self._get_fraud_score(txn)
+            
+            # Apply additional rule-based checks
+            triggered_rules = self._apply_fraud_rules(txn)
+            
+            # Update transaction with results
+            self._apply_score(txn, fraud_score, timezone.now())
+            
+            suspicious = fraud_score >= self.medium_threshold or bool(triggered_rules)
             with transaction.atomic():
-                # Create transaction
-                txn = self._create_transaction(transaction_data)
-                
-                # Get fraud score from ML service
-                fraud_score = self._get_fraud_score(txn)
-                
-                # Apply additional rule-based checks
-                triggered_rules = self._apply_fraud_rules(txn)
-                
-                # Update transaction with results
-                txn.fraud_score = fraud_score
-                txn.risk_level = get_risk_level_from_score(fraud_score)
-                txn.processed_at = timezone.now()
-                
-                # Determine transaction status
-                if fraud_score >= self.high_threshold:
-                    txn.status = TransactionStatus.REJECTED
-                elif fraud_score >= self.medium_threshold:
-                    txn.status = TransactionStatus.FLAGGED
-                else:
-                    txn.status = TransactionStatus.APPROVED
-                
-                txn.save()
+                txn.save(update_fields=SCORE_FIELDS)
                 
                 # Generate alerts if suspicious
-                if fraud_score >= self.medium_threshold or triggered_rules:
+                if suspicious:
                     self._create_alert(txn, triggered_rules, fraud_score)
-                
-                logger.info(f"Transaction {txn.reference} processed. Score: {fraud_score}, Status: {txn.status}")
-                return txn
-                
+            
+            # Flagged, alert and case counts changed; clean transactions only move the
+            # totals, which are left to age out with the cache TTL
+            if suspicious:
+                invalidate_fraud_stats()
+            
+            logger.info(f"Transaction {txn.reference} processed. Score: {fraud_score}, Status: {txn.status}")
+            return txn
+            
         except Exception as e:
             logger.error(f"Error processing transaction: {str(e)}")
             raise FraudDetectionError(f"Failed to process transaction: {str(e)}")
     
+    def process_transactions_bulk(self, transactions_data: List[Dict[str, Any]]) -> List[Transaction]:
+        """
+        Batch variant of process_transaction.
+        
+        Scores all rows with a single ML request, then inserts them, evaluates
+        rules from two grouped queries and writes alerts and cases in one
+        transaction, so a failure leaves no half-processed rows.
+        """
+        try:
+            txns = [self._build_transaction(data) for data in transactions_data]
+            
+            # Scoring needs only in-memory fields, so the ML round trip happens
+            # before any DB transaction is open
+            fraud_scores = self._get_fraud_scores(txns)
+            
+            processed_at = timezone.now()
+            for txn, fraud_score in zip(txns, fraud_scores):
+                self._apply_score(txn, fraud_score, processed_at)
+            
+            with transaction.atomic():
+                # Rows go in already scored; the rule queries below see them, as
+                # the per-row path's queries see its own insert
+                Transaction.objects.bulk_create(txns, batch_size=100)
+                rules_by_txn = self._apply_fraud_rules_bulk(txns)
+                
+                alerts = [
+                    self._build_alert(txn, triggered_rules, fraud_score)
+                    for txn, fraud_score, triggered_rules in zip(txns, fraud_scores, rules_by_txn)
+                    if fraud_score >= self.medium_threshold or triggered_rules
+                ]
+                
+                Alert.objects.bulk_create(alerts, batch_size=100)
+                FraudCase.objects.bulk_create(
+                    [
+                        self._build_fraud_case(alert, processed_at)
+                        for alert in alerts
+                        if alert.severity in [AlertSeverity.HIGH, AlertSeverity.CRITICAL]
+                    ],
+                    batch_size=100
+                )
+            
+            # One stats invalidation per batch; single-row changes age out with the cache TTL
+            invalidate_fraud_stats()
+            logger.info(f"Bulk processed {len(txns)} transactions, {len(alerts)} alerts raised")
+            return txns
+            
+        except Exception as e:
+            logger.error(f"Error processing transaction batch: {str(e)}")
+            raise FraudDetectionError(f"Failed to process transaction batch: {str(e)}")
+    
+    def _apply_score(self, txn: Transaction, fraud_score: float, processed_at: datetime):
+        """Set score, risk level and resulting status on a transaction."""
+        txn.fraud_score = fraud_score
+        txn.risk_level = get_risk_level_from_score(fraud_score)
+        txn.processed_at = processed_at
+        
+        if fraud_score >= self.high_threshold:
+            txn.status = TransactionStatus.REJECTED
+        elif fraud_score >= self.medium_threshold:
+            txn.status = TransactionStatus.FLAGGED
+        else:
+            txn.status = TransactionStatus.APPROVED
+    
     def _create_transaction(self, data: Dict[str, Any]) -> Transaction:
         """Create transaction record from input data."""
-        reference = data.get('reference') or generate_transaction_reference()
-        
-        return Transaction.objects.create(
-            reference=reference,
-            user_id=data['user_id'],
-            account_number=data.get('account_number', ''),
-            amount=Decimal(str(data['amount'])),
-            currency=data.get('currency', 'USD'),
-            transaction_type=data.get('transaction_type', 'payment'),
-            merchant_id=data.get('merchant_id', ''),
-            merchant_name=data.get('merchant_name', ''),
-            merchant_category=data.get('merchant_category', ''),
-            ip_address=data.get('ip_address'),
-            country=data.get('country', ''),
-            city=data.get('city', ''),
-            device_id=data.get('device_id', ''),
-            transaction_date=data.get('transaction_date', timezone.now()),
-            ml_features=data.get('ml_features', {})
-        )
+        txn = self._build_transaction(data)
+        try:
+            with transaction.atomic():
+                txn.save()
+        except IntegrityError:
+            # A retried async task finds its row already inserted; resume scoring it
+            existing = Transaction.objects.filter(
+                reference=txn.reference, status=TransactionStatus.PENDING
+            ).first()
+            if existing is None:
+                raise
+            return existing
+        return txn
+    
+    def _build_transaction(self, data: Dict[str, Any]) -> Transaction:
+        """Build an unsaved transaction from input data."""
+        payload = {**_TXN_DEFAULTS, **{key: data[key] for key in _TXN_INPUT_FIELDS.intersection(data)}}
+        payload['reference'] = data.get('reference') or generate_transaction_reference()
+        payload['user_id'] = data['user_id']
+        
+        amount = data['amount']
+        payload['amount'] = amount if isinstance(amount, Decimal) else Decimal(str(amount))
+        
+        if 'transaction_date' not in data:
+            payload['transaction_date'] = timezone.now()
+        if 'ml_features' not in data:
+            payload['ml_features'] = {}
+        
+        return Transaction(**payload)
     
     def _get_fraud_score(self, txn: Transaction) -> float:
         """Get fraud score from ML service with fallback."""
@@ -101,7 +233,7 @@ class FraudDetectionService:
             features = self._prepare_features(txn)
             
             # Call FastAPI ML service
-            response = requests.post(
+            response = _ML_SESSION.post(
                 f"{self.ml_service_url}/api/v1/score",
                 json={"transaction": features},
                 timeout=5
@@ -118,9 +250,35 @@ class FraudDetectionService:
             logger.error(f"ML service unavailable: {str(e)}, using fallback scoring")
             return calculate_fraud_score_locally(self._prepare_features(txn))
     
+    def _get_fraud_scores(self, txns: List[Transaction]) -> List[float]:
+        """Score many transactions with one ML batch request, falling back per row."""
+        features_list = [self._prepare_features(txn) for txn in txns]
+        
+        try:
+            response = _ML_SESSION.post(
+                f"{self.ml_service_url}/api/v1/score/score/batch",
+                json={"transactions": features_list},
+                timeout=10
+            )
+            
+            if response.status_code == 200:
+                results = response.json().get('results', [])
+                if len(results) == len(features_list):
+                    return [
+                        result['prediction'].get('fraud_score', 0.0) if result.get('success')
+                        else calculate_fraud_score_locally(features)
+                        for result, features in zip(results, features_list)
+                    ]
+            logger.warning(f"ML batch scoring returned status {response.status_code}, using fallback")
+                
+        except requests.exceptions.RequestException as e:
+            logger.error(f"ML service unavailable: {str(e)}, using fallback scoring")
+        
+        return [calculate_fraud_score_locally(features) for features in features_list]
+    
     def _prepare_features(self, txn: Transaction) -> Dict[str, Any]:
         """Prepare transaction features for ML model."""
-        return {
+        features = {
             'user_id': txn.user_id,
             'amount': float(txn.amount),
             'transaction_type': txn.transaction_type,
@@ -130,11 +288,95 @@ class FraudDetectionService:
             'hour': txn.transaction_date.hour,
             'day_of_week': txn.transaction_date.weekday(),
             'device_id': txn.device_id,
-            **txn.ml_features
         }
+        # Extra features override the base ones; most transactions carry none
+        if txn.ml_features:
+            features.update(txn.ml_features)
+        return features
     
     def _apply_fraud_rules(self, txn: Transaction) -> list:
         """Apply rule-based fraud detection checks."""
+        # Velocity count and the previous transaction come from one query. The
+        # location rule only looks back 2 hours, so both windows bound the scan.
+        window_start = timezone.now() - timedelta(hours=1)
+        since = min(window_start, txn.transaction_date - timedelta(hours=2))
+        previous = Transaction.objects.filter(
+            user_id=txn.user_id,
+            transaction_date__gte=since,
+            transaction_date__lt=txn.transaction_date
+        ).order_by('-transaction_date')
+        history = list(
+            Transaction.objects.filter(user_id=txn.user_id, transaction_date__gte=since)
+            .order_by()
+            .values('user_id')
+            .annotate(
+                recent_count=Count('id', filter=Q(transaction_date__gte=window_start)),
+                last_date=Max('transaction_date', filter=Q(transaction_date__lt=txn.transaction_date)),
+                last_country=Subquery(previous.values('country')[:1]),
+            )[:1]
+        )
+        history = history[0] if history else {}
+        
+        triggered_rules, matched_ids = self._evaluate_rules(
+            txn,
+            history.get('recent_count', 0),
+            history.get('last_date'),
+            history.get('last_country')
+        )
+        
+        if matched_ids:
+            FraudPattern.objects.filter(id__in=matched_ids).update(detection_count=F('detection_count') + 1)
+        
+        return triggered_rules
+    
+    def _apply_fraud_rules_bulk(self, txns: List[Transaction]) -> List[list]:
+        """Apply rule-based checks to already-inserted transactions with grouped queries."""
+        user_ids = {txn.user_id for txn in txns}
+        window_start = timezone.now() - timedelta(hours=1)
+        
+        recent_counts = dict(
+            Transaction.objects.filter(
+                user_id__in=user_ids,
+                transaction_date__gte=window_start
+            ).order_by().values('user_id').annotate(cnt=Count('id')).values_list('user_id', 'cnt')
+        )
+        # The counts include the whole batch; like sequential processing, each row
+        # should count only itself and the rows before it, so track the ones after
+        later_in_window = Counter(txn.user_id for txn in txns if txn.transaction_date >= window_start)
+        
+        # Location change only fires within 2 hours, so that window bounds the history we need
+        history = defaultdict(list)
+        for user_id, country, txn_date in Transaction.objects.filter(
+            user_id__in=user_ids,
+            transaction_date__gte=min(txn.transaction_date for txn in txns) - timedelta(hours=2),
+            transaction_date__lt=max(txn.transaction_date for txn in txns)
+        ).order_by('transaction_date').values_list('user_id', 'country', 'transaction_date'):
+            history[user_id].append((txn_date, country))
+        
+        rules_by_txn = []
+        matched_counts = Counter()
+        for txn in txns:
+            if txn.transaction_date >= window_start:
+                later_in_window[txn.user_id] -= 1
+            recent_count = recent_counts.get(txn.user_id, 0) - later_in_window[txn.user_id]
+            
+            user_history = history[txn.user_id]
+            idx = bisect_left(user_history, (txn.transaction_date,)) - 1
+            last_date, last_country = user_history[idx] if idx >= 0 else (None, None)
+            
+            triggered_rules, matched_ids = self._evaluate_rules(
+                txn, recent_count, last_date, last_country
+            )
+            rules_by_txn.append(triggered_rules)
+            matched_counts.update(matched_ids)
+        
+        for pattern_id, count in matched_counts.items():
+            FraudPattern.objects.filter(id=pattern_id).update(detection_count=F('detection_count') + count)
+        
+        return rules_by_txn
+    
+    def _evaluate_rules(self, txn: Transaction, recent_txns: int, last_date, last_country) -> Tuple[list, list]:
+        """Evaluate fraud rules against pre-fetched history; returns (triggered_rules, matched_pattern_ids)."""
         triggered_rules = []
         
         # Rule 1: High amount transaction
@@ -145,11 +387,7 @@ class FraudDetectionService:
             })
         
         # Rule 2: Velocity check - multiple transactions in short time
-        recent_txns = Transaction.objects.filter(
-            user_id=txn.user_id,
-            transaction_date__gte=timezone.now() - timedelta(hours=1)
-        ).count()
-        
+
         if recent_txns > 10:
             triggered_rules.append({
                 'rule': 'high_velocity',
@@ -157,17 +395,12 @@ class FraudDetectionService:
             })
         
         # Rule 3: Location change detection
-        last_txn = Transaction.objects.filter(
-            user_id=txn.user_id,
-            transaction_date__lt=txn.transaction_date
-        ).order_by('-transaction_date').first()
-        
-        if last_txn and last_txn.country != txn.country:
-            time_diff = (txn.transaction_date - last_txn.transaction_date).total_seconds() / 3600
+        if last_date and last_country != txn.country:
+            time_diff = (txn.transaction_date - last_date).total_seconds() / 3600
             if time_diff < 2:  # Same user in different country within 2 hours
                 triggered_rules.append({
                     'rule': 'location_change',
-                    'message': f'Location changed from {last_txn.country} to {txn.country} in {time_diff:.1f} hours'
+                    'message': f'Location changed from {last_country} to {txn.country} in {time_diff:.1f} hours'
                 })
         
         # Rule 4: Unusual time
@@ -178,43 +411,37 @@ class FraudDetectionService:
             })
         
         # Rule 5: Check against known fraud patterns
-        active_patterns = FraudPattern.objects.filter(is_active=True)
-        for pattern in active_patterns:
-            if self._matches_pattern(txn, pattern):
+        matched_ids = []
+        for pattern_id, pattern_name, matches in _get_active_patterns():
+            if matches(txn):
                 triggered_rules.append({
                     'rule': 'pattern_match',
-                    'message': f'Matches fraud pattern: {pattern.pattern_name}'
+                    'message': f'Matches fraud pattern: {pattern_name}'
                 })
-                pattern.detection_count += 1
-                pattern.save()
+                matched_ids.append(pattern_id)
         
-        return triggered_rules
+        return triggered_rules, matched_ids
     
     def _matches_pattern(self, txn: Transaction, pattern: FraudPattern) -> bool:
         """Check if transaction matches a fraud pattern."""
-        conditions = pattern.conditions
-        
-        # Simple pattern matching (extend based on your needs)
-        if 'amount_range' in conditions:
-            min_amt, max_amt = conditions['amount_range']
-            if not (min_amt <= float(txn.amount) <= max_amt):
-                return False
-        
-        if 'merchant_category' in conditions:
-            if txn.merchant_category not in conditions['merchant_category']:
-                return False
-        
-        if 'countries' in conditions:
-            if txn.country not in conditions['countries']:
-                return False
-        
-        return True
+        return _compile_pattern(pattern.conditions)(txn)
     
     def _create_alert(self, txn: Transaction, triggered_rules: list, fraud_score: float):
         """Create fraud alert for suspicious transaction."""
+        alert = self._build_alert(txn, triggered_rules, fraud_score)
+        alert.save()
+        
+        # Auto-create fraud case for high severity alerts
+        if alert.severity in [AlertSeverity.HIGH, AlertSeverity.CRITICAL]:
+            self._create_fraud_case(alert)
+        
+        logger.info(f"Alert {alert.alert_id} created for transaction {txn.reference}")
+    
+    def _build_alert(self, txn: Transaction, triggered_rules: list, fraud_score: float) -> Alert:
+        """Build an unsaved fraud alert for a suspicious transaction."""
         severity = self._determine_severity(fraud_score, triggered_rules)
         
-        alert = Alert.objects.create(
+        return Alert(
             alert_id=f"ALERT-{txn.reference}",
             transaction=txn,
             alert_type='fraud_detection',
@@ -224,16 +451,10 @@ class FraudDetectionService:
             metadata={
                 'fraud_score': fraud_score,
                 'risk_level': txn.risk_level,
-                'amount': str(txn.amount),
+                'amount': txn.amount,
                 'user_id': txn.user_id
             }
         )
-        
-        # Auto-create fraud case for high severity alerts
-        if severity in [AlertSeverity.HIGH, AlertSeverity.CRITICAL]:
-            self._create_fraud_case(alert)
-        
-        logger.info(f"Alert {alert.alert_id} created for transaction {txn.reference}")
     
     def _determine_severity(self, fraud_score: float, triggered_rules: list) -> str:
         """Determine alert severity based on score and rules."""
@@ -247,10 +468,18 @@ class FraudDetectionService:
     
     def _create_fraud_case(self, alert: Alert):
         """Auto-create fraud case from high-severity alert."""
+        case = self._build_fraud_case(alert)
+        case.save()
+        
+        logger.info(f"Fraud case {case.case_number} created from alert {alert.alert_id}")
+    
+    def _build_fraud_case(self, alert: Alert, now=None) -> FraudCase:
+        """Build an unsaved fraud case from a high-severity alert; batch callers pass a shared now."""
         txn = alert.transaction
-        case_number = f"CASE-{timezone.now().strftime('%Y%m%d')}-{txn.reference[-8:]}"
+        now = now or timezone.now()
+        case_number = f"CASE-{now:%Y%m%d}-{txn.reference[-8:]}"
         
-        FraudCase.objects.create(
+        return FraudCase(
             case_number=case_number,
             transaction=txn,
             title=f"Suspicious transaction: {txn.reference}",
@@ -259,8 +488,6 @@ class FraudDetectionService:
             severity=alert.severity,
             estimated_loss=txn.amount,
         )
-        
-        logger.info(f"Fraud case {case_number} created from alert {alert.alert_id}")
 
 class FraudCaseService:
     """Service for managing fraud case investigations."""
@@ -268,17 +495,18 @@ class FraudCaseService:
     @staticmethod
     def assign_case(case_id: int, user_id: int) -> FraudCase:
         """Assign fraud case to analyst."""
-      
-        User = get_user_model()
-        
-        case = FraudCase.objects.get(id=case_id)
-        user = User.objects.get(id=user_id)
+        # Write the FK id directly instead of loading the case and user first
+        updated = FraudCase.objects.filter(id=case_id).update(
+            assigned_to_id=user_id,
+            status=FraudStatus.INVESTIGATING,
+            updated_at=timezone.now()
+        )
+        if not updated:
+            raise FraudCase.DoesNotExist(f"Fraud case {case_id} does not exist")
         
-        case.assigned_to = user
-        case.status = FraudStatus.INVESTIGATING
-        case.save()
+        case = FraudCase.objects.select_related('transaction', 'assigned_to', 'created_by').get(id=case_id)
         
-        logger.info(f"Case {case.case_number} assigned to {user.email}")
+        logger.info(f"Case {case.case_number} assigned to {case.assigned_to.email}")
         return case
     
     @staticmethod
@@ -294,23 +522,20 @@ class FraudCaseService:
             case.resolved_at = timezone.now()
         
         case.save()
+        # Active/resolved case counts feed the cached dashboard
+        invalidate_fraud_stats()
         logger.info(f"Case {case.case_number} status updated to {status}")
         return case
     
     @staticmethod
     def add_case_note(case_id: int, user_id: int, note: str, is_internal: bool = True):
         """Add investigation note to case."""
-        
-        User = get_user_model()
-        
-        case = FraudCase.objects.get(id=case_id)
-        user = User.objects.get(id=user_id)
-        
         case_note = CaseNote.objects.create(
-            case=case,
-            author=user,
+            case_id=case_id,
+            author_id=user_id,
             note=note,
             is_internal=is_internal
         )
         
-        return case_note
+        # Re-read with the author_full_name annotation CaseNoteSerializer expects
+        return CaseNote.objects.with_author_name().get(pk=case_note.pk)
@@ -1,14 +1,29 @@
-from celery import shared_task
+from celery import chord, group, shared_task
+from django.core.cache import cache
+from django.db import transaction as db_transaction
 from django.utils import timezone
 from django.db.models import Count, Sum, Q
-from datetime import timedelta
+from datetime import datetime, time, timedelta
 import logging
 from .models import Transaction, Alert, FraudCase
 from .services import FraudDetectionService
-from common.constants import AlertSeverity, FraudStatus
+from common.constants import AlertSeverity, FraudStatus, TransactionStatus
+from common.utils import invalidate_fraud_stats
 
 logger = logging.getLogger(__name__)
 
+# Transactions per chunk task when fanning out a bulk submission
+BULK_CHUNK_SIZE = 25
+
+# Rows removed per delete statement in cleanup_old_transactions
+CLEANUP_BATCH_SIZE = 10000
+
+# Finished daily reports are kept for a week
+DAILY_REPORT_CACHE_TTL = 7 * 24 * 3600
+
+# The service only holds settings-derived thresholds, so one instance serves every task
+fraud_service = FraudDetectionService()
+
 @shared_task(bind=True, max_retries=3)
 def process_transaction_async(self, transaction_data: dict):
     """
@@ -16,8 +31,7 @@ def process_transaction_async(self, transaction_data: dict):
     Used for batch processing or when immediate response is not required.
     """
     try:
-        service = FraudDetectionService()
-        transaction = service.process_transaction(transaction_data)
+        transaction = fraud_service.process_transaction(transaction_data)
         
         return {
             'success': True,
@@ -30,79 +44,110 @@ def process_transaction_async(self, transaction_data: dict):
         logger.error(f"Task failed for transaction: {str(e)}")
         raise self.retry(exc=e, countdown=60)
 
-@shared_task
+@shared_task(ignore_result=True)
 def process_pending_alerts():
     """
     Periodic task to process unacknowledged alerts.
     Runs every 5 minutes via Celery Beat.
     """
+    # Alerts unhandled for 30 minutes with no case yet; only the columns case creation needs
+    now = timezone.now()
     pending_alerts = Alert.objects.filter(
         is_acknowledged=False,
-        severity__in=[AlertSeverity.HIGH, AlertSeverity.CRITICAL]
+        severity__in=[AlertSeverity.HIGH, AlertSeverity.CRITICAL],
+        created_at__lte=now - timedelta(minutes=30),
+        case__isnull=True
+    ).select_related('transaction').only(
+        'id', 'alert_id', 'severity', 'message',
+        'transaction__id', 'transaction__reference', 'transaction__amount',
     ).order_by('-created_at')[:50]
     
-    processed_count = 0
-    for alert in pending_alerts:
-        try:
-            # Check if alert needs escalation
-            alert_age = (timezone.now() - alert.created_at).total_seconds() / 60
-            
-            if alert_age > 30 and not alert.case:  # 30 minutes unhandled
-                # Create fraud case
-                from .services import FraudDetectionService
-                service = FraudDetectionService()
-                service._create_fraud_case(alert)
-                processed_count += 1
-                
-        except Exception as e:
-            logger.error(f"Error processing alert {alert.alert_id}: {str(e)}")
-    
-    logger.info(f"Processed {processed_count} pending alerts")
-    return {'processed': processed_count}
+    alerts = list(pending_alerts)
+    if not alerts:
+        logger.info("Processed 0 pending alerts")
+        return {'processed': 0}
+    
+    # Build cases in memory, one per transaction, then link to any the transaction
+    # already has; case numbers carry the escalation date, so they can't be the key
+    built = {}
+    for alert in alerts:
+        if alert.transaction_id not in built:
+            built[alert.transaction_id] = fraud_service._build_fraud_case(alert, now)
+        alert.case = built[alert.transaction_id]
+    
+    # Descending ids, so each transaction maps to its earliest case
+    existing = dict(
+        FraudCase.objects.filter(transaction_id__in=list(built))
+        .order_by('-id')
+        .values_list('transaction_id', 'id')
+    )
+    new_cases = [case for txn_id, case in built.items() if txn_id not in existing]
+    
+    with db_transaction.atomic():
+        FraudCase.objects.bulk_create(new_cases)
+        for alert in alerts:
+            if alert.transaction_id in existing:
+                alert.case_id = existing[alert.transaction_id]
+        Alert.objects.bulk_update(alerts, ['case'])
+    
+    # One stats invalidation per escalation run rather than per row
+    invalidate_fraud_stats()
+    
+    logger.info(f"Processed {len(alerts)} pending alerts, created {len(new_cases)} cases")
+    return {'processed': len(alerts), 'cases_created': len(new_cases)}
 
-@shared_task
+@shared_task(ignore_result=True)
 def generate_daily_fraud_report():
     """
     Generate daily fraud detection report.
     Runs daily at 1 AM via Celery Beat.
     """
     yesterday = timezone.now().date() - timedelta(days=1)
-    start_time = timezone.make_aware(timezone.datetime.combine(yesterday, timezone.datetime.min.time()))
-    end_time = timezone.make_aware(timezone.datetime.combine(yesterday, timezone.datetime.max.time()))
     
-    # Gather statistics
+    # The window is in the past, so reruns and retries can reuse the stored report
+    cache_key = f'daily_fraud_report:{yesterday.isoformat()}'
+    cached = cache.get(cache_key)
+    if cached is not None:
+        return cached
+    
+    # Half-open [midnight, next midnight) window
+    start_time = timezone.make_aware(datetime.combine(yesterday, time.min))
+    end_time = start_time + timedelta(days=1)
+    flagged = Q(fraud_score__gte=0.5)
+    
+    # Gather statistics, one aggregate per table
+    txn_stats = Transaction.objects.filter(
+        transaction_date__gte=start_time, transaction_date__lt=end_time
+    ).aggregate(
+        total=Count('id'),
+        flagged=Count('id', filter=flagged),
+        flagged_amount=Sum('amount', filter=flagged),
+    )
+    alert_stats = Alert.objects.filter(
+        created_at__gte=start_time, created_at__lt=end_time
+    ).aggregate(
+        total=Count('id'),
+        high_severity=Count('id', filter=Q(severity__in=[AlertSeverity.HIGH, AlertSeverity.CRITICAL])),
+    )
+    created = Q(created_at__gte=start_time, created_at__lt=end_time)
+    resolved = Q(resolved_at__gte=start_time, resolved_at__lt=end_time)
+    case_stats = FraudCase.objects.filter(created | resolved).aggregate(
+        new=Count('id', filter=created),
+        resolved=Count('id', filter=resolved),
+    )
+    
     stats = {
         'date': str(yesterday),
-        'total_transactions': Transaction.objects.filter(
-            transaction_date__range=(start_time, end_time)
-        ).count(),
-        'flagged_transactions': Transaction.objects.filter(
-            transaction_date__range=(start_time, end_time),
-            fraud_score__gte=0.5
-        ).count(),
-        'total_alerts': Alert.objects.filter(
-            created_at__range=(start_time, end_time)
-        ).count(),
-        'high_severity_alerts': Alert.objects.filter(
-            created_at__range=(start_time, end_time),
-            severity__in=[AlertSeverity.HIGH, AlertSeverity.CRITICAL]
-        ).count(),
-        'new_cases': FraudCase.objects.filter(
-            created_at__range=(start_time, end_time)
-        ).count(),
-        'resolved_cases': FraudCase.objects.filter(
-            resolved_at__range=(start_time, end_time)
-        ).count(),
+        'total_transactions': txn_stats['total'],
+        'flagged_transactions': txn_stats['flagged'],
+        'total_alerts': alert_stats['total'],
+        'high_severity_alerts': alert_stats['high_severity'],
+        'new_cases': case_stats['new'],
+        'resolved_cases': case_stats['resolved'],
+        'flagged_amount': float(txn_stats['flagged_amount'] or 0),
     }
     
-    # Calculate total amounts
-    flagged_amount = Transaction.objects.filter(
-        transaction_date__range=(start_time, end_time),
-        fraud_score__gte=0.5
-    ).aggregate(total=Sum('amount'))['total'] or 0
-    
-    stats['flagged_amount'] = float(flagged_amount)
-    
+    cache.set(cache_key, stats, timeout=DAILY_REPORT_CACHE_TTL)
     logger.info(f"Daily fraud report generated: {stats}")
     
     # TODO: Send email report to stakeholders
@@ -110,7 +155,7 @@ def generate_daily_fraud_report():
     
     return stats
 
-@shared_task
+@shared_task(ignore_result=True)
 def cleanup_old_transactions():
     """
     Archive or delete old processed transactions.
@@ -120,48 +165,103 @@ def cleanup_old_transactions():
     
     old_transactions = Transaction.objects.filter(
         created_at__lt=cutoff_date,
-        status='APPROVED',
+        status=TransactionStatus.APPROVED,
         fraud_score__lt=0.3
     )
     
-    count = old_transactions.count()
+    # Delete in bounded PK batches so no more than one window of ids is held at a time
+    deleted = 0
+    while True:
+        ids = list(old_transactions.values_list('id', flat=True)[:CLEANUP_BATCH_SIZE])
+        if not ids:
+            break
+        # only('id') keeps the deletion collector from loading the JSON columns
+        Transaction.objects.filter(id__in=ids).only('id').delete()
+        deleted += len(ids)
     
-    # Archive to separate table or delete (implement based on requirements)
-    # For now, just log
-    logger.info(f"Found {count} old transactions eligible for cleanup")
+    if deleted:
+        invalidate_fraud_stats()
+    logger.info(f"Cleaned up {deleted} old transactions")
     
-    return {'eligible_for_cleanup': count}
+    return {'deleted': deleted}
 
 @shared_task
-def bulk_process_transactions(transaction_list: list):
-    """
-    Bulk process multiple transactions efficiently.
-    Useful for batch imports or historical data processing.
-    """
-    service = FraudDetectionService()
-    results = []
-    
-    for txn_data in transaction_list:
-        try:
-            txn = service.process_transaction(txn_data)
-            results.append({
+def process_transaction_chunk(transaction_list: list):
+    """Process one slice of a bulk submission and return per-row results."""
+    try:
+        txns = fraud_service.process_transactions_bulk(transaction_list)
+        return [
+            {
                 'reference': txn.reference,
                 'success': True,
-                'fraud_score': txn.fraud_score
-            })
-        except Exception as e:
-            results.append({
+                'fraud_score': txn.fraud_score,
+                'risk_level': txn.risk_level,
+                'status': txn.status
+            }
+            for txn in txns
+        ]
+    except Exception as e:
+        # The chunk is processed as a unit, so a failure applies to every row in it
+        logger.error(f"Bulk chunk of {len(transaction_list)} transactions failed: {str(e)}")
+        return [
+            {
                 'reference': txn_data.get('reference', 'unknown'),
                 'success': False,
                 'error': str(e)
-            })
-    
+            }
+            for txn_data in transaction_list
+        ]
+
+@shared_task
+def summarize_bulk_results(chunk_results: list):
+    """Merge per-chunk results into the bulk submission summary."""
+    results = [row for chunk in chunk_results for row in chunk]
     successful = sum(1 for r in results if r['success'])
-    logger.info(f"Bulk processed {successful}/{len(transaction_list)} transactions")
+    logger.info(f"Bulk processed {successful}/{len(results)} transactions")
     
     return {
-        'total': len(transaction_list),
+        'total': len(results),
         'successful': successful,
-        'failed': len(transaction_list) - successful,
+        'failed': len(results) - successful,
         'results': results
     }
+
+@shared_task(bind=True)
+def bulk_process_transactions(self, transaction_list: list):
+    """
+    Bulk process multiple transactions efficiently.
+    Useful for batch imports or historical data processing.
+    
+    Batches larger than BULK_CHUNK_SIZE are fanned out to a chord of chunk
+    tasks so they spread across workers; the task's result is the summary.
+    """
+    chunks = _chunk_transactions(transaction_list)
+    
+    if len(chunks) <= 1:
+        return summarize_bulk_results([process_transaction_chunk(transaction_list)])
+    
+    raise self.replace(_bulk_chord(chunks))
+
+def dispatch_bulk_transactions(transaction_list: list):
+    """
+    Publish a bulk submission straight to the chunk tasks from the caller.
+    
+    Skips the hop through bulk_process_transactions; the returned result
+    resolves to the same summary.
+    """
+    chunks = _chunk_transactions(transaction_list)
+    if len(chunks) <= 1:
+        return bulk_process_transactions.delay(transaction_list)
+    return _bulk_chord(chunks).apply_async()
+
+def _chunk_transactions(transaction_list: list) -> list:
+    return [
+        transaction_list[i:i + BULK_CHUNK_SIZE]
+        for i in range(0, len(transaction_list), BULK_CHUNK_SIZE)
+    ]
+
+def _bulk_chord(chunks: list):
+    return chord(
+        group(process_transaction_chunk.s(chunk) for chunk in chunks),
+        summarize_bulk_results.s()
+    )
@@ -1,3 +1,269 @@
-from django.test import TestCase
+import json
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from unittest.mock import patch
 
-# Create your tests here.
+from django.core.cache import cache
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from .models import Transaction, Alert, FraudCase
+from .services import FraudDetectionService
+from .views import TransactionViewSet
+from .tasks import (
+    BULK_CHUNK_SIZE, bulk_process_transactions, chord, dispatch_bulk_transactions,
+    generate_daily_fraud_report, process_pending_alerts, process_transaction_chunk,
+    summarize_bulk_results,
+)
+from common.constants import AlertSeverity
+from common.exceptions import FraudDetectionError
+
+# Keep cached stats and reports in process so tests don't need Redis
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+def _create_transaction(reference, **fields):
+    return Transaction.objects.create(**{
+        'reference': reference,
+        'user_id': 'TEST-USER',
+        'account_number': '0001',
+        'amount': Decimal('250.00'),
+        'transaction_type': 'payment',
+        'transaction_date': timezone.now(),
+        **fields,
+    })
+
+def _fixed_scores(score):
+    """Stand-in for the ML batch call: every transaction gets the same score."""
+    return lambda txns: [score] * len(txns)
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class BulkProcessingTests(TestCase):
+    """process_transactions_bulk must flag the same rows as per-row processing."""
+
+    def setUp(self):
+        self.service = FraudDetectionService()
+
+    def _rows(self, count, user_id='BULK-USER'):
+        start = timezone.now() - timedelta(minutes=30)
+        return [
+            {'user_id': user_id, 'amount': 10, 'country': 'US', 'transaction_date': start + timedelta(seconds=i)}
+            for i in range(count)
+        ]
+
+    def test_velocity_counts_only_earlier_rows_in_batch(self):
+        with patch.object(FraudDetectionService, '_get_fraud_scores', side_effect=_fixed_scores(0.1)):
+            txns = self.service.process_transactions_bulk(self._rows(11))
+
+        rules = {
+            alert.transaction_id: {rule['rule'] for rule in alert.triggered_rules}
+            for alert in Alert.objects.filter(transaction__in=txns)
+        }
+        flagged = ['high_velocity' in rules.get(txn.id, set()) for txn in txns]
+
+        # Sequentially, only the 11th transaction in the hour exceeds 10
+        self.assertEqual(flagged, [False] * 10 + [True])
+
+    def test_rows_are_stored_scored(self):
+        with patch.object(FraudDetectionService, '_get_fraud_scores', side_effect=_fixed_scores(0.95)):
+            txns = self.service.process_transactions_bulk(self._rows(3))
+
+        stored = Transaction.objects.filter(id__in=[txn.id for txn in txns])
+        self.assertEqual(stored.count(), 3)
+        self.assertTrue(all(txn.fraud_score == 0.95 and txn.processed_at for txn in stored))
+        self.assertEqual(Alert.objects.filter(transaction__in=stored).count(), 3)
+
+    def test_failure_leaves_no_rows(self):
+        with patch.object(FraudDetectionService, '_get_fraud_scores', side_effect=_fixed_scores(0.6)), \
+                patch.object(Alert.objects, 'bulk_create', side_effect=RuntimeError('alert insert failed')):
+            with self.assertRaises(FraudDetectionError):
+                self.service.process_transactions_bulk(self._rows(3))
+
+        self.assertFalse(Transaction.objects.filter(user_id='BULK-USER').exists())
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class PendingAlertEscalationTests(TestCase):
+    """process_pending_alerts opens one case per transaction and reuses existing ones."""
+
+    def _alert(self, txn, suffix, minutes_ago=45):
+        alert = Alert.objects.create(
+            alert_id=f'ALERT-{txn.reference}-{suffix}',
+            transaction=txn,
+            alert_type='fraud_detection',
+            severity=AlertSeverity.HIGH,
+            message='Suspicious transaction',
+        )
+        # created_at is auto_now_add; backdate it past the 30-minute grace period
+        Alert.objects.filter(pk=alert.pk).update(created_at=timezone.now() - timedelta(minutes=minutes_ago))
+        return alert
+
+    def test_alerts_for_one_transaction_share_a_case(self):
+        txn = _create_transaction('TXN-ESCALATE-00000001')
+        first, second = self._alert(txn, 'a'), self._alert(txn, 'b', minutes_ago=90)
+
+        result = process_pending_alerts()
+
+        self.assertEqual(result, {'processed': 2, 'cases_created': 1})
+        case = FraudCase.objects.get(transaction=txn)
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual((first.case_id, second.case_id), (case.id, case.id))
+
+    def test_existing_case_is_reused_across_days(self):
+        txn = _create_transaction('TXN-ESCALATE-00000002')
+        # Opened on an earlier day, so its number differs from one built today
+        existing = FraudCase.objects.create(
+            case_number='CASE-20240101-00000002',
+            transaction=txn,
+            title='Earlier case',
+            description='Opened before midnight',
+            severity=AlertSeverity.HIGH,
+        )
+        alert = self._alert(txn, 'a')
+
+        result = process_pending_alerts()
+
+        self.assertEqual(result['cases_created'], 0)
+        self.assertEqual(FraudCase.objects.filter(transaction=txn).count(), 1)
+        alert.refresh_from_db()
+        self.assertEqual(alert.case_id, existing.id)
+
+    def test_recent_alerts_wait(self):
+        txn = _create_transaction('TXN-ESCALATE-00000003')
+        alert = self._alert(txn, 'a', minutes_ago=5)
+
+        self.assertEqual(process_pending_alerts(), {'processed': 0})
+        alert.refresh_from_db()
+        self.assertIsNone(alert.case_id)
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class BulkFanOutTests(TestCase):
+    """Bulk submissions fan out one chunk task per BULK_CHUNK_SIZE rows."""
+
+    def _rows(self, count):
+        now = timezone.now()
+        return [
+            {'reference': f'TXN-FANOUT-{i:08d}', 'user_id': f'FANOUT-{i}', 'amount': 10, 'transaction_date': now}
+            for i in range(count)
+        ]
+
+    def test_large_batch_dispatches_one_signature_per_chunk(self):
+        rows = self._rows(BULK_CHUNK_SIZE * 2 + 1)
+
+        # autospec keeps the chord instance as the first recorded argument
+        with patch.object(chord, 'apply_async', autospec=True) as apply_async:
+            dispatch_bulk_transactions(rows)
+
+        apply_async.assert_called_once()
+        fan_out = apply_async.call_args.args[0]
+        signatures = list(fan_out.tasks)
+        self.assertEqual([len(sig.args[0]) for sig in signatures], [BULK_CHUNK_SIZE, BULK_CHUNK_SIZE, 1])
+        self.assertTrue(all(sig.task == process_transaction_chunk.name for sig in signatures))
+        self.assertEqual([row for sig in signatures for row in sig.args[0]], rows)
+        self.assertEqual(fan_out.body.task, summarize_bulk_results.name)
+
+    def test_single_chunk_skips_the_chord(self):
+        rows = self._rows(BULK_CHUNK_SIZE)
+
+        with patch.object(chord, 'apply_async', autospec=True) as apply_async, \
+                patch.object(bulk_process_transactions, 'delay') as delay:
+            dispatch_bulk_transactions(rows)
+
+        apply_async.assert_not_called()
+        delay.assert_called_once_with(rows)
+
+    def test_small_batch_is_summarized_inline(self):
+        with patch.object(FraudDetectionService, '_get_fraud_scores', side_effect=_fixed_scores(0.1)):
+            summary = bulk_process_transactions(self._rows(3))
+
+        self.assertEqual((summary['total'], summary['successful'], summary['failed']), (3, 3, 0))
+        self.assertEqual(Transaction.objects.filter(reference__startswith='TXN-FANOUT-').count(), 3)
+
+    def test_failed_chunk_reports_every_row(self):
+        rows = self._rows(2)
+        with patch.object(FraudDetectionService, 'process_transactions_bulk', side_effect=FraudDetectionError('boom')):
+            results = process_transaction_chunk(rows)
+
+        self.assertEqual([r['reference'] for r in results], [row['reference'] for row in rows])
+        self.assertFalse(any(r['success'] for r in results))
+
+    def test_summary_merges_chunks(self):
+        summary = summarize_bulk_results([
+            [{'reference': 'A', 'success': True}, {'reference': 'B', 'success': False}],
+            [{'reference': 'C', 'success': True}],
+        ])
+
+        self.assertEqual((summary['total'], summary['successful'], summary['failed']), (3, 2, 1))
+        self.assertEqual([r['reference'] for r in summary['results']], ['A', 'B', 'C'])
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class DailyReportTests(TestCase):
+    """generate_daily_fraud_report covers yesterday only and is cached per date."""
+
+    def setUp(self):
+        cache.clear()
+        self.yesterday = timezone.now().date() - timedelta(days=1)
+        noon = timezone.make_aware(datetime.combine(self.yesterday, time(12)))
+        _create_transaction('TXN-REPORT-00000001', transaction_date=noon, fraud_score=0.8)
+        _create_transaction('TXN-REPORT-00000002', transaction_date=noon, fraud_score=0.1)
+        _create_transaction('TXN-REPORT-00000003', transaction_date=timezone.now(), fraud_score=0.9)
+
+    def test_report_counts_yesterday(self):
+        stats = generate_daily_fraud_report()
+
+        self.assertEqual(stats['date'], str(self.yesterday))
+        self.assertEqual((stats['total_transactions'], stats['flagged_transactions']), (2, 1))
+        self.assertEqual(stats['flagged_amount'], 250.0)
+
+    def test_rerun_is_served_from_cache(self):
+        stats = generate_daily_fraud_report()
+
+        with self.assertNumQueries(0):
+            self.assertEqual(generate_daily_fraud_report(), stats)
+        self.assertEqual(cache.get(f'daily_fraud_report:{self.yesterday.isoformat()}'), stats)
+
+    def test_report_for_another_date_is_not_reused(self):
+        earlier = self.yesterday - timedelta(days=1)
+        cache.set(f'daily_fraud_report:{earlier.isoformat()}', {'date': str(earlier)})
+
+        self.assertEqual(generate_daily_fraud_report()['date'], str(self.yesterday))
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class TransactionStreamTests(TestCase):
+    """The stream action writes one JSON object per transaction."""
+
+    def setUp(self):
+        user = get_user_model().objects.create_user(email='stream@example.com', password='not-used')
+        self.client = APIClient()
+        self.client.force_authenticate(user=user)
+        for i in range(3):
+            _create_transaction(f'TXN-STREAM-{i:08d}', user_id='STREAM-USER')
+        _create_transaction('TXN-STREAM-OTHER001', user_id='OTHER-USER')
+
+    def _lines(self, response):
+        body = b''.join(response.streaming_content).decode()
+        return [json.loads(line) for line in body.splitlines()]
+
+    def test_streams_ndjson_rows(self):
+        response = self.client.get(reverse('transaction-stream'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        rows = self._lines(response)
+        self.assertEqual(len(rows), 4)
+        self.assertTrue(all(set(row) == set(TransactionViewSet.list_only_fields) for row in rows))
+        self.assertIn({'reference': 'TXN-STREAM-00000000', 'amount': '250.00'},
+                      [{'reference': r['reference'], 'amount': r['amount']} for r in rows])
+
+    def test_stream_applies_filters(self):
+        response = self.client.get(reverse('transaction-stream'), {'user_id': 'STREAM-USER'})
+
+        references = sorted(row['reference'] for row in self._lines(response))
+        self.assertEqual(references, [f'TXN-STREAM-{i:08d}' for i in range(3)])
+
+    def test_requires_authentication(self):
+        response = APIClient().get(reverse('transaction-stream'))
+
+        self.assertIn(response.status_code, (401, 403))
@@ -3,9 +3,13 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django_filters.rest_framework import DjangoFilterBackend
-from django.db.models import Count, Avg, Sum, Q
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Count, Avg, Sum, Q, Prefetch
+from django.db.models.functions import TruncDate
+from django.http import StreamingHttpResponse
 from django.utils import timezone
-from datetime import timedelta
+from datetime import datetime, time, timedelta
 import logging
 
 from .models import Transaction, FraudCase, Alert, FraudPattern, CaseNote
@@ -16,18 +20,22 @@ from .serializers import (
     FraudCaseCreateSerializer, FraudCaseUpdateSerializer,
     CaseNoteSerializer, CaseNoteCreateSerializer,
     FraudPatternSerializer, FraudStatisticsSerializer,
-    BulkTransactionSerializer
+    BulkTransactionSerializer, BulkTransactionStatusSerializer
 )
-from .services import FraudDetectionService, FraudCaseService
-from .tasks import process_transaction_async, bulk_process_transactions
+from .services import FraudCaseService
+from .tasks import process_transaction_async, dispatch_bulk_transactions
 from common.permissions import IsFraudAnalyst, CanManageFraudCases
-from common.constants import FraudStatus, AlertSeverity
+from common.constants import FraudStatus, AlertSeverity, TransactionStatus
+from common.utils import fraud_stats_cache_key, generate_transaction_reference, invalidate_fraud_stats
 
 
 
 
 logger = logging.getLogger(__name__)
 
+# Dashboards poll frequently; statistics may lag by up to this many seconds
+DASHBOARD_CACHE_TTL = 60
+
 class TransactionViewSet(viewsets.ModelViewSet):
     """
     ViewSet for managing transactions and fraud detection.
@@ -44,6 +52,34 @@ class TransactionViewSet(viewsets.ModelViewSet):
     ordering_fields = ['transaction_date', 'amount', 'fraud_score', 'created_at']
     ordering = ['-transaction_date']
     
+    # Columns TransactionSerializer renders; list views skip ml_features and friends
+    list_only_fields = [
+        'id', 'reference', 'user_id', 'account_number', 'amount', 'currency',
+        'transaction_type', 'merchant_id', 'merchant_name', 'merchant_category',
+        'ip_address', 'country', 'city', 'device_id',
+        'fraud_score', 'risk_level', 'status', 'transaction_date', 'created_at', 'processed_at'
+    ]
+    
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action in ['list', 'high_risk', 'flagged']:
+            queryset = queryset.only(*self.list_only_fields)
+        elif self.action == 'retrieve':
+            # TransactionDetailSerializer reads these via to_attr instead of querying per row
+            queryset = queryset.prefetch_related(
+                Prefetch(
+                    'alerts',
+                    queryset=Alert.objects.select_related('transaction', 'acknowledged_by').order_by('-created_at')[:5],
+                    to_attr='prefetched_alerts'
+                ),
+                Prefetch(
+                    'fraud_cases',
+                    queryset=FraudCase.objects.select_related('assigned_to', 'transaction'),
+                    to_attr='prefetched_cases'
+                ),
+            )
+        return queryset
+    
     def get_serializer_class(self):
         if self.action == 'create':
             return TransactionCreateSerializer
@@ -53,25 +89,32 @@ class TransactionViewSet(viewsets.ModelViewSet):
     
     def create(self, request, *args, **kwargs):
         """
-        Process new transaction through fraud detection system.
+        Queue new transaction for fraud detection.
+        
+        The reference is assigned up front so callers can look the
+        transaction up once a worker has scored it.
         """
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         
+        transaction_data = dict(serializer.validated_data)
+        transaction_data['reference'] = generate_transaction_reference()
+        
         try:
-            # Synchronous processing for immediate response
-            service = FraudDetectionService()
-            transaction = service.process_transaction(serializer.validated_data)
-            
-            response_serializer = TransactionDetailSerializer(transaction)
-            return Response(response_serializer.data, status=status.HTTP_201_CREATED)
-            
+            task = process_transaction_async.delay(transaction_data)
         except Exception as e:
-            logger.error(f"Error processing transaction: {str(e)}")
+            logger.error(f"Error queueing transaction: {str(e)}")
             return Response(
-                {'error': 'Failed to process transaction', 'detail': str(e)},
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+                {'error': 'Failed to queue transaction', 'detail': str(e)},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE
             )
+        
+        return Response({
+            'task_id': task.id,
+            'reference': transaction_data['reference'],
+            'status': TransactionStatus.PENDING,
+            'message': 'Transaction submitted for processing'
+        }, status=status.HTTP_202_ACCEPTED)
     
     @action(detail=False, methods=['post'])
     def submit_async(self, request):
@@ -100,7 +143,7 @@ class TransactionViewSet(viewsets.ModelViewSet):
         
         transactions_data = serializer.validated_data['transactions']
         
-        task = bulk_process_transactions.delay(transactions_data)
+        task = dispatch_bulk_transactions(transactions_data)
         
         return Response({
             'task_id': task.id,
@@ -112,17 +155,40 @@ class TransactionViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def high_risk(self, request):
         """Get all high-risk transactions."""
-        high_risk_txns = self.queryset.filter(
+        high_risk_txns = self.filter_queryset(self.get_queryset()).filter(
             Q(risk_level='HIGH') | Q(risk_level='CRITICAL')
-        ).order_by('-fraud_score')[:50]
+        ).order_by('-fraud_score')
         
-        serializer = self.get_serializer(high_risk_txns, many=True)
+        page = self.paginate_queryset(high_risk_txns)
+        if page is not None:
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+        
+        serializer = self.get_serializer(high_risk_txns[:50], many=True)
         return Response(serializer.data)
     
+    @action(detail=False, methods=['get'])
+    def stream(self, request):
+        """
+        Stream filtered transactions as newline-delimited JSON.
+        
+        Rows are read in chunks and written as they arrive, so exports of
+        any size run in constant memory.
+        """
+        rows = self.filter_queryset(self.get_queryset()).values(
+            *self.list_only_fields
+        ).iterator(chunk_size=2000)
+        encoder = DjangoJSONEncoder()
+        
+        return StreamingHttpResponse(
+            (encoder.encode(row) + '\n' for row in rows),
+            content_type='application/x-ndjson'
+        )
+    
     @action(detail=False, methods=['get'])
     def flagged(self, request):
         """Get all flagged transactions pending review."""
-        flagged_txns = self.queryset.filter(status='FLAGGED').order_by('-transaction_date')
+        flagged_txns = self.filter_queryset(self.get_queryset()).filter(status='FLAGGED').order_by('-transaction_date')
         
         page = self.paginate_queryset(flagged_txns)
         if page is not None:
@@ -137,7 +203,7 @@ class TransactionViewSet(viewsets.ModelViewSet):
         """Manually approve a flagged transaction."""
         transaction = self.get_object()
         transaction.status = 'APPROVED'
-        transaction.save()
+        transaction.save(update_fields=['status'])
         
         logger.info(f"Transaction {transaction.reference} approved by {request.user.email}")
         
@@ -149,12 +215,25 @@ class TransactionViewSet(viewsets.ModelViewSet):
         """Manually reject a flagged transaction."""
         transaction = self.get_object()
         transaction.status = 'REJECTED'
-        transaction.save()
+        transaction.save(update_fields=['status'])
         
         logger.info(f"Transaction {transaction.reference} rejected by {request.user.email}")
         
         serializer = self.get_serializer(transaction)
         return Response(serializer.data)
+    
+    @action(detail=False, methods=['post'], permission_classes=[IsFraudAnalyst])
+    def bulk_approve(self, request):
+        """Approve several transactions with a single UPDATE."""
+        serializer = BulkTransactionStatusSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        
+        ids = serializer.validated_data['ids']
+        updated = Transaction.objects.filter(id__in=ids).update(status=TransactionStatus.APPROVED)
+        
+        logger.info(f"{updated} transactions bulk-approved by {request.user.email}")
+        
+        return Response({'requested': len(ids), 'updated': updated})
 
 class FraudCaseViewSet(viewsets.ModelViewSet):
     """
@@ -168,6 +247,28 @@ class FraudCaseViewSet(viewsets.ModelViewSet):
     ordering_fields = ['created_at', 'updated_at', 'severity']
     ordering = ['-created_at']
     
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action in ('list', 'my_cases', 'pending'):
+            # FraudCaseListSerializer reads the transaction and assignee
+            queryset = queryset.select_related('transaction', 'assigned_to')
+        elif self.action == 'retrieve':
+            # Mirror the relations FraudCaseDetailSerializer nests
+            queryset = queryset.select_related(
+                'transaction', 'assigned_to', 'created_by'
+            ).prefetch_related(
+                Prefetch(
+                    'alerts',
+                    queryset=Alert.objects.select_related('transaction', 'acknowledged_by')
+                ),
+                Prefetch(
+                    'notes',
+                    queryset=CaseNote.objects.with_author_name()[:10],
+                    to_attr='prefetched_notes'
+                ),
+            )
+        return queryset
+    
     def get_serializer_class(self):
         if self.action == 'create':
             return FraudCaseCreateSerializer
@@ -179,6 +280,7 @@ class FraudCaseViewSet(viewsets.ModelViewSet):
     
     def perform_create(self, serializer):
         serializer.save(created_by=self.request.user)
+        invalidate_fraud_stats()
     
     @action(detail=True, methods=['post'])
     def assign(self, request, pk=None):
@@ -233,7 +335,7 @@ class FraudCaseViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def my_cases(self, request):
         """Get cases assigned to current user."""
-        my_cases = self.queryset.filter(assigned_to=request.user)
+        my_cases = self.filter_queryset(self.get_queryset()).filter(assigned_to=request.user)
         
         page = self.paginate_queryset(my_cases)
         if page is not None:
@@ -246,7 +348,7 @@ class FraudCaseViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def pending(self, request):
         """Get all pending cases."""
-        pending_cases = self.queryset.filter(status=FraudStatus.PENDING)
+        pending_cases = self.filter_queryset(self.get_queryset()).filter(status=FraudStatus.PENDING)
         
         page = self.paginate_queryset(pending_cases)
         if page is not None:
@@ -268,6 +370,19 @@ class AlertViewSet(viewsets.ReadOnlyModelViewSet):
     ordering_fields = ['created_at', 'severity']
     ordering = ['-created_at']
     
+    # AlertSerializer reads every alert column but only one column from each joined row
+    only_fields = [
+        'id', 'alert_id', 'transaction', 'alert_type', 'severity', 'message',
+        'triggered_rules', 'metadata', 'is_acknowledged', 'acknowledged_by',
+        'acknowledged_at', 'case', 'created_at',
+        'transaction__reference', 'acknowledged_by__email'
+    ]
+    
+    def get_queryset(self):
+        return super().get_queryset().select_related(
+            'transaction', 'acknowledged_by'
+        ).only(*self.only_fields)
+    
     @action(detail=True, methods=['post'])
     def acknowledge(self, request, pk=None):
         """Acknowledge an alert."""
@@ -282,7 +397,7 @@ class AlertViewSet(viewsets.ReadOnlyModelViewSet):
         alert.is_acknowledged = True
         alert.acknowledged_by = request.user
         alert.acknowledged_at = timezone.now()
-        alert.save()
+        alert.save(update_fields=['is_acknowledged', 'acknowledged_by', 'acknowledged_at'])
         
         serializer = self.get_serializer(alert)
         return Response(serializer.data)
@@ -290,7 +405,7 @@ class AlertViewSet(viewsets.ReadOnlyModelViewSet):
     @action(detail=False, methods=['get'])
     def unacknowledged(self, request):
         """Get all unacknowledged alerts."""
-        unack_alerts = self.queryset.filter(is_acknowledged=False).order_by('-severity', '-created_at')
+        unack_alerts = self.filter_queryset(self.get_queryset()).filter(is_acknowledged=False).order_by('-severity', '-created_at')
         
         page = self.paginate_queryset(unack_alerts)
         if page is not None:
@@ -303,9 +418,14 @@ class AlertViewSet(viewsets.ReadOnlyModelViewSet):
     @action(detail=False, methods=['get'])
     def critical(self, request):
         """Get critical alerts."""
-        critical_alerts = self.queryset.filter(severity=AlertSeverity.CRITICAL).order_by('-created_at')[:20]
+        critical_alerts = self.filter_queryset(self.get_queryset()).filter(severity=AlertSeverity.CRITICAL).order_by('-created_at')
+        
+        page = self.paginate_queryset(critical_alerts)
+        if page is not None:
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
         
-        serializer = self.get_serializer(critical_alerts, many=True)
+        serializer = self.get_serializer(critical_alerts[:20], many=True)
         return Response(serializer.data)
 
 class FraudPatternViewSet(viewsets.ModelViewSet):
@@ -323,7 +443,7 @@ class FraudPatternViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def active(self, request):
         """Get all active fraud patterns."""
-        active_patterns = self.queryset.filter(is_active=True)
+        active_patterns = self.filter_queryset(self.get_queryset()).filter(is_active=True)
         serializer = self.get_serializer(active_patterns, many=True)
         return Response(serializer.data)
 
@@ -338,38 +458,48 @@ class FraudStatisticsViewSet(viewsets.ViewSet):
         """Get fraud detection dashboard statistics."""
         # Time range filter
         days = int(request.query_params.get('days', 7))
-        start_date = timezone.now() - timedelta(days=days)
         
-        # Calculate statistics
-        total_transactions = Transaction.objects.filter(created_at__gte=start_date).count()
-        flagged_transactions = Transaction.objects.filter(
-            created_at__gte=start_date,
-            fraud_score__gte=0.5
-        ).count()
-        
-        total_alerts = Alert.objects.filter(created_at__gte=start_date).count()
-        high_severity_alerts = Alert.objects.filter(
-            created_at__gte=start_date,
-            severity__in=[AlertSeverity.HIGH, AlertSeverity.CRITICAL]
-        ).count()
-        
-        active_cases = FraudCase.objects.filter(
-            status__in=[FraudStatus.PENDING, FraudStatus.INVESTIGATING]
-        ).count()
+        stats = cache.get_or_set(
+            fraud_stats_cache_key('fraud_dashboard_stats', days),
+            lambda: self._dashboard_stats(days),
+            timeout=DASHBOARD_CACHE_TTL
+        )
+        return Response(stats)
+    
+    def _dashboard_stats(self, days: int) -> dict:
+        """Aggregate dashboard statistics, one conditional aggregate per table."""
+        start_date = timezone.now() - timedelta(days=days)
         
-        resolved_cases = FraudCase.objects.filter(
-            resolved_at__gte=start_date
-        ).count()
+        txn_stats = Transaction.objects.filter(created_at__gte=start_date).aggregate(
+            total=Count('id'),
+            flagged=Count('id', filter=Q(fraud_score__gte=0.5)),
+            avg_score=Avg('fraud_score')
+        )
+        alert_stats = Alert.objects.filter(created_at__gte=start_date).aggregate(
+            total=Count('id'),
+            high_severity=Count('id', filter=Q(severity__in=[AlertSeverity.HIGH, AlertSeverity.CRITICAL]))
+        )
+        active = Q(status__in=[FraudStatus.PENDING, FraudStatus.INVESTIGATING])
+        resolved = Q(resolved_at__gte=start_date)
+        recent = Q(created_at__gte=start_date)
+        # The OR lets Postgres combine the three indexes instead of scanning every case
+        case_stats = FraudCase.objects.filter(active | resolved | recent).aggregate(
+            active=Count('id', filter=active),
+            resolved=Count('id', filter=resolved),
+            estimated_loss=Sum('estimated_loss', filter=recent)
+        )
         
-        total_estimated_loss = FraudCase.objects.filter(
-            created_at__gte=start_date
-        ).aggregate(total=Sum('estimated_loss'))['total'] or 0
+        total_transactions = txn_stats['total']
+        flagged_transactions = txn_stats['flagged']
+        total_alerts = alert_stats['total']
+        high_severity_alerts = alert_stats['high_severity']
+        active_cases = case_stats['active']
+        resolved_cases = case_stats['resolved']
+        total_estimated_loss = case_stats['estimated_loss'] or 0
         
         fraud_rate = (flagged_transactions / total_transactions * 100) if total_transactions > 0 else 0
         
-        avg_fraud_score = Transaction.objects.filter(
-            created_at__gte=start_date
-        ).aggregate(avg=Avg('fraud_score'))['avg'] or 0
+        avg_fraud_score = txn_stats['avg_score'] or 0
         
         stats = {
             'total_transactions': total_transactions,
@@ -385,25 +515,41 @@ class FraudStatisticsViewSet(viewsets.ViewSet):
         
         serializer = FraudStatisticsSerializer(data=stats)
         serializer.is_valid(raise_exception=True)
-        
-        return Response(serializer.data)
+        return dict(serializer.data)
     
     @action(detail=False, methods=['get'])
     def trends(self, request):
         """Get fraud detection trends over time."""
         days = int(request.query_params.get('days', 30))
         
+        daily_stats = cache.get_or_set(
+            fraud_stats_cache_key('fraud_trends', days),
+            lambda: self._trend_stats(days),
+            timeout=DASHBOARD_CACHE_TTL
+        )
+        return Response({'trends': daily_stats})
+    
+    def _trend_stats(self, days: int) -> list:
+        """Per-day transaction and flagged counts, newest day first."""
+        today = timezone.localdate()
+        start = timezone.make_aware(datetime.combine(today - timedelta(days=days - 1), time.min))
+        
+        # One grouped query; days without transactions are filled in below
+        per_day = {
+            row['day']: row
+            for row in Transaction.objects.filter(transaction_date__gte=start)
+            .annotate(day=TruncDate('transaction_date'))
+            .values('day')
+            .annotate(total=Count('id'), flagged=Count('id', filter=Q(fraud_score__gte=0.5)))
+            .order_by()
+        }
+        
         daily_stats = []
         for i in range(days):
-            date = timezone.now().date() - timedelta(days=i)
-            start = timezone.make_aware(timezone.datetime.combine(date, timezone.datetime.min.time()))
-            end = timezone.make_aware(timezone.datetime.combine(date, timezone.datetime.max.time()))
-            
-            txn_count = Transaction.objects.filter(transaction_date__range=(start, end)).count()
-            flagged_count = Transaction.objects.filter(
-                transaction_date__range=(start, end),
-                fraud_score__gte=0.5
-            ).count()
+            date = today - timedelta(days=i)
+            row = per_day.get(date)
+            txn_count = row['total'] if row else 0
+            flagged_count = row['flagged'] if row else 0
             
             daily_stats.append({
                 'date': str(date),
@@ -412,4 +558,4 @@ class FraudStatisticsViewSet(viewsets.ViewSet):
                 'fraud_rate': (flagged_count / txn_count * 100) if txn_count > 0 else 0
             })
         
-        return Response({'trends': daily_stats})
+        return daily_stats
@@ -1,44 +1,41 @@
 from rest_framework import permissions
 from common.constants import UserRole
 
-class IsAdminUser(permissions.BasePermission):
-    """Allow access only to admin users."""
-    
+class RolePermission(permissions.BasePermission):
+    """Allow access to authenticated users whose role is in allowed_roles."""
+    allowed_roles = frozenset()
+
     def has_permission(self, request, view):
-        return request.user and request.user.is_authenticated and request.user.role == UserRole.ADMIN
+        user = request.user
+        return user and user.is_authenticated and user.role in self.allowed_roles
 
-class IsFraudAnalyst(permissions.BasePermission):
+class IsAdminUser(RolePermission):
+    """Allow access only to admin users."""
+    allowed_roles = frozenset({UserRole.ADMIN})
+
+class IsFraudAnalyst(RolePermission):
     """Allow access to fraud analysts and admins."""
-    
-    def has_permission(self, request, view):
-        return request.user and request.user.is_authenticated and \
-               request.user.role in [UserRole.ADMIN, UserRole.FRAUD_ANALYST]
+    allowed_roles = frozenset({UserRole.ADMIN, UserRole.FRAUD_ANALYST})
 
-class IsRiskManager(permissions.BasePermission):
+class IsRiskManager(RolePermission):
     """Allow access to risk managers and admins."""
-    
-    def has_permission(self, request, view):
-        return request.user and request.user.is_authenticated and \
-               request.user.role in [UserRole.ADMIN, UserRole.RISK_MANAGER]
+    allowed_roles = frozenset({UserRole.ADMIN, UserRole.RISK_MANAGER})
 
-class IsAuditor(permissions.BasePermission):
+class IsAuditor(RolePermission):
     """Allow access to auditors and admins."""
-    
-    def has_permission(self, request, view):
-        return request.user and request.user.is_authenticated and \
-               request.user.role in [UserRole.ADMIN, UserRole.AUDITOR]
+    allowed_roles = frozenset({UserRole.ADMIN, UserRole.AUDITOR})
 
 class CanManageFraudCases(permissions.BasePermission):
     """Permission to manage fraud cases."""
-    
+    allowed_roles = frozenset({UserRole.ADMIN, UserRole.FRAUD_ANALYST})
+
     def has_permission(self, request, view):
+        user = request.user
         if request.method in permissions.SAFE_METHODS:
-            return request.user.is_authenticated
-        return request.user and request.user.role in [
-            UserRole.ADMIN, UserRole.FRAUD_ANALYST
-        ]
-    
+            return user.is_authenticated
+        return user and user.role in self.allowed_roles
+
     def has_object_permission(self, request, view, obj):
         if request.method in permissions.SAFE_METHODS:
             return True
-        return request.user.role in [UserRole.ADMIN, UserRole.FRAUD_ANALYST]
+        return request.user.role in self.allowed_roles
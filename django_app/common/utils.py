@@ -1,35 +1,78 @@
 import logging
+import os
+import time
 from typing import Dict, Any
-from decimal import Decimal
 from datetime import datetime, timedelta
 from django.core.cache import cache
+from common.constants import RiskLevel
 
 logger = logging.getLogger(__name__)
 
+# (lower bound, level) pairs, checked from the highest threshold down
+_RISK_TABLE = (
+    (0.8, RiskLevel.CRITICAL),
+    (0.5, RiskLevel.HIGH),
+    (0.3, RiskLevel.MEDIUM),
+)
+
+# Bumped whenever fraud data changes; embedded in dashboard/trend cache keys
+FRAUD_STATS_VERSION_KEY = 'fraud_stats_version'
+
+def fraud_stats_cache_key(name: str, *parts) -> str:
+    """Build a cache key for aggregated fraud stats under the current data version."""
+    version = cache.get_or_set(FRAUD_STATS_VERSION_KEY, 1, timeout=None)
+    return ':'.join([name, f'v{version}', *map(str, parts)])
+
+def invalidate_fraud_stats():
+    """
+    Retire every cached stats response by moving to a new key version.
+    
+    Call after writes that change what the stats read: scores and alerts, case
+    creation and case status. Transaction status and alert acknowledgement are
+    not part of the stats and need no invalidation.
+    """
+    try:
+        cache.incr(FRAUD_STATS_VERSION_KEY)
+    except ValueError:
+        pass  # No version yet, so nothing has been cached under one
+
 def calculate_fraud_score_locally(transaction_data: Dict[str, Any]) -> float:
     """
     Fallback local fraud scoring when ML service is unavailable.
     Uses rule-based heuristics.
     """
+    # Check transaction frequency (count of earlier transactions in the window)
+    txn_count = 0
+    user_id = transaction_data.get('user_id')
+    if user_id:
+        cache_key = f'txn_count_{user_id}'
+        try:
+            txn_count = cache.incr(cache_key) - 1
+        except ValueError:
+            # First transaction in the window; add() loses to a concurrent seed, so incr again
+            if not cache.add(cache_key, 1, timeout=3600):
+                txn_count = cache.incr(cache_key) - 1
+    
+    try:
+        amount = float(transaction_data.get('amount') or 0)
+    except (TypeError, ValueError):
+        amount = 0.0
+    
+    return _local_score_kernel(amount, txn_count, datetime.now().hour)
+
+def _local_score_kernel(amount: float, txn_count: int, hour: int) -> float:
+    """Heuristic score over plain numeric inputs; kept free of I/O and Decimal allocation."""
     score = 0.0
     
-    amount = Decimal(str(transaction_data.get('amount', 0)))
-    if amount > 50000:
+    if amount > 50000.0:
         score += 0.3
-    elif amount > 10000:
+    elif amount > 10000.0:
         score += 0.2
     
-    # Check transaction frequency
-    user_id = transaction_data.get('user_id')
-    if user_id:
-        cache_key = f'txn_count_{user_id}'
-        txn_count = cache.get(cache_key, 0)
-        if txn_count > 10:
-            score += 0.3
-        cache.set(cache_key, txn_count + 1, timeout=3600)
+    if txn_count > 10:
+        score += 0.3
     
     # Time-based checks
-    hour = datetime.now().hour
     if hour < 6 or hour > 23:
         score += 0.2
     
@@ -37,14 +80,9 @@ def calculate_fraud_score_locally(transaction_data: Dict[str, Any]) -> float:
 
 def get_risk_level_from_score(score: float) -> str:
     """Convert fraud score to risk level."""
-    from common.constants import RiskLevel
-    
-    if score >= 0.8:
-        return RiskLevel.CRITICAL
-    elif score >= 0.5:
-        return RiskLevel.HIGH
-    elif score >= 0.3:
-        return RiskLevel.MEDIUM
+    for threshold, level in _RISK_TABLE:
+        if score >= threshold:
+            return level
     return RiskLevel.LOW
 
 def mask_sensitive_data(data: str, visible_chars: int = 4) -> str:
@@ -54,7 +92,5 @@ def mask_sensitive_data(data: str, visible_chars: int = 4) -> str:
     return '*' * (len(data) - visible_chars) + data[-visible_chars:]
 
 def generate_transaction_reference() -> str:
-    """Generate unique transaction reference."""
-    from uuid import uuid4
-    timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
-    return f'TXN{timestamp}{str(uuid4())[:8].upper()}'
+    """Generate unique transaction reference: nanosecond timestamp plus 4 random bytes."""
+    return f'TXN{time.time_ns()}{os.urandom(4).hex().upper()}'
@@ -157,6 +157,14 @@ CELERY_TIMEZONE = TIME_ZONE
 CELERY_TASK_TRACK_STARTED = True
 CELERY_TASK_TIME_LIMIT = 30 * 60
 
+# Cache (shared by web and worker processes)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': config('REDIS_CACHE_URL', default='redis://redis:6379/1'),
+    }
+}
+
 # FastAPI ML Service
 FASTAPI_ML_URL = config('FASTAPI_ML_URL')
 
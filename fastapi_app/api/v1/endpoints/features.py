@@ -1,14 +1,25 @@
-from fastapi import APIRouter, HTTPException, status, Depends
+from fastapi import APIRouter, HTTPException, Request, status, Depends
+from fastapi.concurrency import run_in_threadpool
 from typing import Dict, Any
 from schemas.transaction import TransactionInput
-from ml.preprocess import FeatureEngineer
+from services.scoring import get_scoring_service
+from core.cache import payload_cache_key, get_cached_json, set_cached_json, within_rate_limit
+from core.config import settings
 from core.security import verify_api_key
 from core.logging import get_logger
 
 logger = get_logger(__name__)
 router = APIRouter()
 
-feature_engineer = FeatureEngineer()
+# Reuse the scoring service's engineer (one Redis client and script registration)
+feature_engineer = get_scoring_service().feature_engineer
+
+# Seconds an extraction result is reused for an identical request
+FEATURE_CACHE_TTL = 60
+
+# Fixed window for FEATURE_RATE_LIMIT, in seconds
+FEATURE_RATE_WINDOW = 60
+
 
 @router.post(
     "/extract",
@@ -16,6 +27,7 @@ feature_engineer = FeatureEngineer()
     description="Extract engineered features from transaction data"
 )
 async def extract_features(
+    request: Request,
     transaction: TransactionInput,
     api_key: str = Depends(verify_api_key)
 ) -> Dict[str, Any]:
@@ -23,9 +35,28 @@ async def extract_features(
     Extract and return engineered features.
     
     Useful for debugging and understanding feature engineering.
+    Identical requests within FEATURE_CACHE_TTL seconds are answered from Redis,
+    so client retries neither rerun the pipeline nor bump velocity counters twice.
+    Each client gets settings.FEATURE_RATE_LIMIT requests per FEATURE_RATE_WINDOW.
     """
+    client_host = request.client.host if request.client else 'unknown'
+    if not await within_rate_limit(
+        request, f'ratelimit:feat:{client_host}', settings.FEATURE_RATE_LIMIT, FEATURE_RATE_WINDOW
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Feature extraction rate limit exceeded"
+        )
+    
     try:
-        features = feature_engineer.extract_features(transaction.dict())
+        # Only client-sent fields: a defaulted transaction_date is now() and would differ per retry
+        cache_key = payload_cache_key('feat:', transaction.model_dump(mode='json', exclude_unset=True))
+        
+        features = await get_cached_json(request, cache_key)
+        if features is None:
+            features = await run_in_threadpool(feature_engineer.extract_features, transaction.model_dump())
+            await set_cached_json(request, cache_key, features, FEATURE_CACHE_TTL)
+        
         return {
             'user_id': transaction.user_id,
             'amount': transaction.amount,
@@ -1,30 +1,56 @@
-from fastapi import APIRouter, status
+from fastapi import APIRouter, Request, status
+from fastapi.responses import JSONResponse
 from schemas.prediction import HealthResponse
 from core.config import settings
-from ml.predict import FraudPredictor
 from core.logging import get_logger
-import redis
+import asyncio
 import psutil
 from datetime import datetime
 
 logger = get_logger(__name__)
 router = APIRouter()
 
+# Seconds between background system resource samples
+SYSTEM_SAMPLE_INTERVAL = 5
+
+async def sample_system_metrics(app):
+    """
+    Refresh app.state.system with CPU and memory figures every SYSTEM_SAMPLE_INTERVAL.
+    
+    Runs for the app's lifetime so health checks read a snapshot instead of sampling.
+    """
+    psutil.cpu_percent(interval=None)  # Start the first CPU window
+    while True:
+        await asyncio.sleep(SYSTEM_SAMPLE_INTERVAL)
+        try:
+            memory = psutil.virtual_memory()
+            app.state.system = {
+                'cpu_percent': psutil.cpu_percent(interval=None),
+                'memory_percent': memory.percent,
+                'memory_available_mb': memory.available / (1024 * 1024)
+            }
+        except Exception as e:
+            logger.error(f"System metrics sampling failed: {str(e)}")
+
+def _model_loaded(request: Request) -> bool:
+    """Whether the predictor loaded at startup is ready to serve."""
+    predictor = getattr(request.app.state, 'predictor', None)
+    return bool(predictor and predictor.model_loaded)
+
 @router.get(
     "/health",
     response_model=HealthResponse,
     summary="Health check",
     description="Check API health status"
 )
-async def health_check():
+async def health_check(request: Request):
     """
     Basic health check endpoint.
     
     Returns service status and model availability.
     """
     try:
-        predictor = FraudPredictor()
-        model_loaded = predictor.model_loaded
+        model_loaded = _model_loaded(request)
         
         return HealthResponse(
             status="healthy" if model_loaded else "degraded",
@@ -44,7 +70,7 @@ async def health_check():
     summary="Detailed health check",
     description="Detailed health status with dependencies"
 )
-async def detailed_health_check():
+async def detailed_health_check(request: Request):
     """
     Detailed health check including dependencies.
     
@@ -59,9 +85,8 @@ async def detailed_health_check():
     
     # Check ML model
     try:
-        predictor = FraudPredictor()
         health_status['checks']['model'] = {
-            'status': 'up' if predictor.model_loaded else 'down',
+            'status': 'up' if _model_loaded(request) else 'down',
             'model_version': settings.MODEL_VERSION
         }
     except Exception as e:
@@ -73,8 +98,7 @@ async def detailed_health_check():
     
     # Check Redis connection
     try:
-        redis_client = redis.from_url(settings.REDIS_URL)
-        redis_client.ping()
+        await request.app.state.redis.ping()
         health_status['checks']['redis'] = {'status': 'up'}
     except Exception as e:
         health_status['checks']['redis'] = {
@@ -83,26 +107,18 @@ async def detailed_health_check():
         }
         health_status['status'] = 'degraded'
     
-    # Check system resources
-    try:
-        cpu_percent = psutil.cpu_percent(interval=1)
-        memory = psutil.virtual_memory()
-        
-        health_status['checks']['system'] = {
-            'status': 'up',
-            'cpu_percent': cpu_percent,
-            'memory_percent': memory.percent,
-            'memory_available_mb': memory.available / (1024 * 1024)
-        }
+    # Check system resources (sampled in the background)
+    system = getattr(request.app.state, 'system', None)
+    if system:
+        health_status['checks']['system'] = {'status': 'up', **system}
         
         # Warn if resources are low
-        if cpu_percent > 90 or memory.percent > 90:
+        if system['cpu_percent'] > 90 or system['memory_percent'] > 90:
             health_status['status'] = 'degraded'
-            
-    except Exception as e:
+    else:
         health_status['checks']['system'] = {
             'status': 'unknown',
-            'error': str(e)
+            'error': 'no sample yet'
         }
     
     return health_status
@@ -112,21 +128,25 @@ async def detailed_health_check():
     summary="Readiness check",
     description="Check if service is ready to handle requests"
 )
-async def readiness_check():
+async def readiness_check(request: Request):
     """
     Kubernetes readiness probe endpoint.
     
     Returns 200 if service is ready, 503 if not.
     """
     try:
-        predictor = FraudPredictor()
-        if predictor.model_loaded:
+        if _model_loaded(request):
             return {'status': 'ready'}
-        else:
-            return {'status': 'not ready', 'reason': 'model not loaded'}
+        return JSONResponse(
+            {'status': 'not ready', 'reason': 'model not loaded'},
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE
+        )
     except Exception as e:
         logger.error(f"Readiness check failed: {str(e)}")
-        return {'status': 'not ready', 'reason': str(e)}
+        return JSONResponse(
+            {'status': 'not ready', 'reason': str(e)},
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE
+        )
 
 @router.get(
     "/liveness",
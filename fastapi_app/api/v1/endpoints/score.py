@@ -1,17 +1,20 @@
-from fastapi import APIRouter, HTTPException, status, Depends
+from fastapi import APIRouter, HTTPException, Request, status, Depends
+from fastapi.concurrency import run_in_threadpool
 from typing import List
 import asyncio
 from schemas.transaction import TransactionInput, BulkTransactionInput
 from schemas.prediction import PredictionResponse, DetailedPredictionResponse
-from services.scoring import FraudScoringService
+from services.scoring import get_scoring_service
+from core.cache import payload_cache_key, get_cached_json, set_cached_json
+from core.config import settings
 from core.security import verify_api_key
 from core.logging import get_logger
 
 logger = get_logger(__name__)
 router = APIRouter()
 
-# Initialize scoring service
-scoring_service = FraudScoringService()
+# Shared scoring service (loads the model at import)
+scoring_service = get_scoring_service()
 
 @router.post(
     "/score",
@@ -20,6 +23,7 @@ scoring_service = FraudScoringService()
     description="Analyze a single transaction and return fraud score"
     )
 async def score_transaction(
+    request: Request,
     transaction: TransactionInput,
     api_key: str = Depends(verify_api_key)
     ):
@@ -27,9 +31,18 @@ async def score_transaction(
     Score a single transaction for fraud detection.
     
     Returns fraud score (0-1), risk level, and recommendation.
+    Identical requests within FRAUD_SCORE_CACHE_TTL seconds are answered from Redis,
+    so client retries neither rerun the model nor bump velocity counters twice.
     """
     try:
-        result = scoring_service.score_transaction(transaction.dict())
+        # Only client-sent fields: a defaulted transaction_date is now() and would differ per retry
+        cache_key = payload_cache_key('fs:', transaction.model_dump(mode='json', exclude_unset=True))
+        
+        result = await get_cached_json(request, cache_key)
+        if result is None:
+            result = await scoring_service.score_transaction_async(transaction.model_dump())
+            await set_cached_json(request, cache_key, result, settings.FRAUD_SCORE_CACHE_TTL)
+        
         return PredictionResponse(**result)
     except Exception as e:
         logger.error(f"Error scoring transaction: {str(e)}")
@@ -56,7 +69,7 @@ async def score_transaction_detailed(
     Includes feature importance, triggered rules, and model confidence.
     """
     try:
-        result = scoring_service.score_transaction_detailed(transaction.dict())
+        result = await run_in_threadpool(scoring_service.score_transaction_detailed, transaction.model_dump())
         return DetailedPredictionResponse(**result)
     except Exception as e:
         logger.error(f"Error in detailed scoring: {str(e)}")
@@ -82,24 +95,27 @@ async def score_transactions_batch(
     Maximum 100 transactions per request.
     """
     try:
-        results = []
+        # One vectorized model call, run off the event loop
+        predictions = await run_in_threadpool(
+            scoring_service.score_batch,
+            [txn.model_dump() for txn in batch.transactions]
+        )
         
-        for txn in batch.transactions:
-            try:
-                result = scoring_service.score_transaction(txn.dict())
+        results = []
+        for txn, result in zip(batch.transactions, predictions):
+            if isinstance(result, Exception):
                 results.append({
                     'user_id': txn.user_id,
                     'amount': txn.amount,
-                    'success': True,
-                    'prediction': result
+                    'success': False,
+                    'error': str(result)
                 })
-            except Exception as e:
-                logger.error(f"Error scoring transaction for user {txn.user_id}: {str(e)}")
+            else:
                 results.append({
                     'user_id': txn.user_id,
                     'amount': txn.amount,
-                    'success': False,
-                    'error': str(e)
+                    'success': True,
+                    'prediction': result
                 })
         
         successful = sum(1 for r in results if r['success'])
@@ -139,7 +155,7 @@ async def score_transaction_async(
     try:
         # For now, process synchronously
         # In production, integrate with Celery
-        result = scoring_service.score_transaction(transaction.dict())
+        result = await run_in_threadpool(scoring_service.score_transaction, transaction.model_dump())
         
         return {
             'status': 'processing',
@@ -0,0 +1,61 @@
+import hashlib
+import json
+from typing import Any, Dict, Optional
+import redis
+from fastapi import Request
+from core.config import settings
+from core.logging import get_logger
+
+logger = get_logger(__name__)
+
+# Shared pool for synchronous clients; callers wait for a free connection
+# instead of opening new ones under bursts
+sync_redis_pool = redis.BlockingConnectionPool.from_url(
+    settings.REDIS_URL, max_connections=settings.REDIS_POOL_SIZE, timeout=5
+)
+
+def payload_cache_key(prefix: str, payload: Dict[str, Any]) -> str:
+    """Build a cache key from a BLAKE2b hash of the canonical JSON payload."""
+    return prefix + hashlib.blake2b(
+        json.dumps(payload, sort_keys=True).encode(), digest_size=16
+    ).hexdigest()
+
+async def get_cached_json(request: Request, cache_key: str) -> Optional[Any]:
+    """Return a cached value, or None on a miss or when Redis is unavailable."""
+    redis_client = getattr(request.app.state, 'redis', None)
+    if redis_client is None:
+        return None
+    try:
+        cached = await redis_client.get(cache_key)
+        return json.loads(cached) if cached else None
+    except Exception as e:
+        logger.warning(f"Cache read failed for {cache_key}: {str(e)}")
+        return None
+
+async def set_cached_json(request: Request, cache_key: str, value: Any, ttl: int):
+    """Cache a JSON-serializable value; failures are logged and otherwise ignored."""
+    redis_client = getattr(request.app.state, 'redis', None)
+    if redis_client is None:
+        return
+    try:
+        await redis_client.set(cache_key, json.dumps(value), ex=ttl)
+    except Exception as e:
+        logger.warning(f"Cache write failed for {cache_key}: {str(e)}")
+
+async def within_rate_limit(request: Request, bucket: str, limit: int, window: int) -> bool:
+    """
+    Count a request against a fixed-window limit; True while the bucket is under it.
+    
+    Fails open when Redis is unavailable, like the cache helpers above.
+    """
+    redis_client = getattr(request.app.state, 'redis', None)
+    if redis_client is None:
+        return True
+    try:
+        count = await redis_client.incr(bucket)
+        if count == 1:
+            await redis_client.expire(bucket, window)
+        return count <= limit
+    except Exception as e:
+        logger.warning(f"Rate limit check failed for {bucket}: {str(e)}")
+        return True
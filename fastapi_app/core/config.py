@@ -1,9 +1,11 @@
-from pydantic_settings import BaseSettings
+from pydantic_settings import BaseSettings, SettingsConfigDict
 from typing import Optional
 
 class Settings(BaseSettings):
     """Application configuration."""
     
+    model_config = SettingsConfigDict(env_file=".env", case_sensitive=True)
+    
     # App settings
     APP_NAME: str = "Fraud Detection ML Service"
     VERSION: str = "1.0.0"
@@ -12,13 +14,20 @@ class Settings(BaseSettings):
     # Model settings
     MODEL_PATH: str = "ml/models/fraud_model.pkl"
     SCALER_PATH: str = "ml/models/scaler.pkl"
+    ONNX_MODEL_PATH: str = "ml/models/fraud_model.onnx"
     MODEL_VERSION: str = "1.0"
+    # Intel oneDAL backend for the sklearn fallback; no effect while the ONNX session serves
+    USE_SKLEARNEX: bool = True  # Disable on non-Intel hardware
     
     # Redis
     REDIS_URL: str = "redis://redis:6379/0"
+    REDIS_POOL_SIZE: int = 50  # Connections per pool, per worker process
+    FRAUD_SCORE_CACHE_TTL: int = 60  # Seconds a score is reused for an identical request
+    FEATURE_RATE_LIMIT: int = 120  # /features/extract requests per client per minute
     
-    # Thresholds
+    # Thresholds: lower bounds of the MEDIUM, HIGH and CRITICAL risk levels
     FRAUD_THRESHOLD_HIGH: float = 0.8
+    FRAUD_THRESHOLD_REVIEW: float = 0.7
     FRAUD_THRESHOLD_MEDIUM: float = 0.5
     
     # Feature engineering
@@ -27,9 +36,5 @@ class Settings(BaseSettings):
     
     # Security
     API_KEY: Optional[str] = None
-    
-    class Config:
-        env_file = ".env"
-        case_sensitive = True
 
 settings = Settings()
@@ -1,12 +1,18 @@
+import hmac
 from fastapi import Security, HTTPException, status
 from fastapi.security import APIKeyHeader
 from core.config import settings
 
 api_key_header = APIKeyHeader(name="X-API-Key", auto_error=False)
 
+# Encoded once; None disables the check
+_API_KEY = settings.API_KEY.encode() if settings.API_KEY else None
+
 async def verify_api_key(api_key: str = Security(api_key_header)):
     """Verify API key for protected endpoints."""
-    if settings.API_KEY and api_key != settings.API_KEY:
+    if _API_KEY is not None and (
+        api_key is None or not hmac.compare_digest(api_key.encode(), _API_KEY)
+    ):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Invalid or missing API key"
@@ -0,0 +1,5 @@
+from uvicorn.workers import UvicornWorker
+
+class UvloopWorker(UvicornWorker):
+    """Uvicorn worker pinned to uvloop and httptools instead of auto-detection."""
+    CONFIG_KWARGS = {"loop": "uvloop", "http": "httptools"}
@@ -0,0 +1,13 @@
+"""
+Gunicorn settings for the ML service.
+
+The app is imported in the master before forking (preload_app), so the model
+and scaler loaded by the scoring service are shared copy-on-write by workers.
+"""
+
+import os
+
+bind = "0.0.0.0:8001"
+workers = int(os.environ.get("WEB_CONCURRENCY", 4))
+worker_class = "core.workers.UvloopWorker"
+preload_app = True
@@ -1,13 +1,20 @@
 from fastapi import FastAPI, Request, status
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, ORJSONResponse
 from fastapi.exceptions import RequestValidationError
 from contextlib import asynccontextmanager
+import asyncio
 import time
+import numpy as np
 import uvicorn
+import redis.asyncio as aioredis
 from core.config import settings
 from core.logging import setup_logging, get_logger
+from core.middleware import TimingMiddleware
 from api.v1.endpoints.router import api_router
+from api.v1.endpoints.health import sample_system_metrics
+from ml.preprocess import N_FEATURES, VELOCITY_SCRIPT, risk_cache_stats
+from services.scoring import get_scoring_service
 
 # Setup logging
 setup_logging(level="INFO" if not settings.DEBUG else "DEBUG")
@@ -22,18 +29,47 @@ async def lifespan(app: FastAPI):
     logger.info(f"Starting {settings.APP_NAME} v{settings.VERSION}")
     logger.info(f"Model version: {settings.MODEL_VERSION}")
     
-    # Verify model is loaded
-    from ml.predict import FraudPredictor
-    predictor = FraudPredictor()
+    # Share the scoring service's predictor so probes never load another model
+    scoring_service = get_scoring_service()
+    predictor = scoring_service.predictor
+    app.state.predictor = predictor
     if predictor.model_loaded:
         logger.info("ML model loaded successfully")
+        _warm_up(scoring_service)
     else:
         logger.warning("ML model not loaded - service may not function correctly")
     
+    # Coalesce concurrent single-row predictions into batched model calls
+    batcher = asyncio.create_task(predictor.run_batcher())
+    
+    # One pooled async Redis client for dependency checks
+    app.state.redis = aioredis.from_url(settings.REDIS_URL, max_connections=settings.REDIS_POOL_SIZE)
+    
+    # Background CPU/memory sampling for the detailed health check
+    app.state.system = None
+    sampler = asyncio.create_task(sample_system_metrics(app))
+    
     yield
     
     # Shutdown
     logger.info("Shutting down application")
+    sampler.cancel()
+    batcher.cancel()
+    await app.state.redis.aclose()
+
+def _warm_up(scoring_service):
+    """
+    Run one prediction, open the feature Redis connection and load the velocity
+    script before serving, so the first real request doesn't pay for lazy initialisation.
+    """
+    start_time = time.perf_counter()
+    try:
+        scoring_service.predictor.predict(np.zeros((1, N_FEATURES), dtype=np.float32))
+        # Also caches the velocity script, so the first EVALSHA doesn't miss
+        scoring_service.feature_engineer.redis_client.script_load(VELOCITY_SCRIPT)
+    except Exception as e:
+        logger.warning(f"Warmup incomplete: {str(e)}")
+    logger.info(f"Warmup complete in {(time.perf_counter() - start_time) * 1000:.1f} ms")
 
 # Create FastAPI app
 app = FastAPI(
@@ -41,6 +77,7 @@ app = FastAPI(
     version=settings.VERSION,
     description="Machine Learning service for real-time fraud detection in banking transactions",
     lifespan=lifespan,
+    default_response_class=ORJSONResponse,
     docs_url="/api/docs",
     redoc_url="/api/redoc",
     openapi_url="/api/openapi.json"
@@ -56,14 +93,7 @@ app.add_middleware(
 )
 
 # Request timing middleware
-@app.middleware("http")
-async def add_process_time_header(request: Request, call_next):
-    """Add processing time to response headers."""
-    start_time = time.time()
-    response = await call_next(request)
-    process_time = time.time() - start_time
-    response.headers["X-Process-Time"] = str(process_time)
-    return response
+app.add_middleware(TimingMiddleware)
 
 # Exception handlers
 @app.exception_handler(RequestValidationError)
@@ -120,6 +150,7 @@ async def get_metrics():
     return {
         "status": "operational",
         "model_loaded": True,
+        "risk_score_cache": risk_cache_stats(),
         # Add more metrics as needed
     }
 
@@ -130,5 +161,7 @@ if __name__ == "__main__":
         host="0.0.0.0",
         port=8001,
         reload=settings.DEBUG,
-        workers=1 if settings.DEBUG else 4
+        workers=1 if settings.DEBUG else 4,
+        loop="uvloop",
+        http="httptools"
     )
@@ -0,0 +1,48 @@
+"""
+Script to export the trained model to ONNX.
+Run after train_model.py; the scaler is folded into the graph. Without an
+exported file the service converts the loaded model at startup instead.
+"""
+
+import joblib
+from pathlib import Path
+import logging
+from sklearn.pipeline import Pipeline
+from skl2onnx import convert_sklearn
+from skl2onnx.common.data_types import FloatTensorType
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+N_FEATURES = 18
+
+def build_onnx_model(model, scaler):
+    """Fold the scaler and model into a single ONNX graph with a dynamic batch dimension."""
+    steps = [('model', model)]
+    if scaler is not None:
+        steps.insert(0, ('scaler', scaler))
+    
+    # zipmap off so probabilities come back as a plain (N, 2) tensor
+    return convert_sklearn(
+        Pipeline(steps),
+        initial_types=[('input', FloatTensorType([None, N_FEATURES]))],
+        options={id(model): {'zipmap': False}}
+    )
+
+def convert_to_onnx():
+    """Convert the saved scaler and model into a single ONNX graph."""
+    models_dir = Path("ml/models")
+    model = joblib.load(models_dir / "fraud_model.pkl")
+    scaler = joblib.load(models_dir / "scaler.pkl")
+    
+    onnx_model = build_onnx_model(model, scaler)
+    
+    onnx_path = models_dir / "fraud_model.onnx"
+    onnx_path.write_bytes(onnx_model.SerializeToString())
+    
+    logger.info(f"ONNX model saved to {onnx_path}")
+    
+    return onnx_path
+
+if __name__ == "__main__":
+    convert_to_onnx()
@@ -1,21 +1,63 @@
+import asyncio
+import os
 import joblib
 import numpy as np
-from typing import Dict, Any, Tuple
+from typing import Dict, Any, List, Tuple
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from core.config import settings
 from core.logging import get_logger
+
+# Intel oneDAL backend for sklearn; must be patched before sklearn is imported.
+# Service-side only: training stays on stock sklearn so the pickle loads anywhere,
+# and predictions bypass sklearn entirely once the ONNX session is loaded.
+if settings.USE_SKLEARNEX:
+    try:
+        from sklearnex import patch_sklearn
+        patch_sklearn()
+    except ImportError:
+        pass
+
 from sklearn.preprocessing import StandardScaler
 from sklearn.ensemble import RandomForestClassifier
 
+try:
+    import onnxruntime as ort
+except ImportError:  # joblib model is used instead
+    ort = None
+
 logger = get_logger(__name__)
 
+# Display names for explanations, in model input order
+FEATURE_NAMES = [
+    'amount', 'log_amount', 'amount_bin',
+    'hour', 'day_of_week', 'is_weekend', 'is_night', 'day_of_month',
+    'txn_count_1h', 'txn_count_24h', 'txn_amount_24h', 'avg_txn_amount_24h',
+    'merchant_category', 'merchant_risk', 'country', 'is_foreign',
+    'device_risk', 'transaction_type'
+]
+
+# Micro-batching limits for concurrent single-row predictions
+MAX_BATCH = 64
+MAX_WAIT_MS = 2
+
+# Sklearn matrices at least this tall are split by rows across threads
+PARALLEL_MIN_ROWS = 32
+_PREDICT_THREADS = os.cpu_count() or 1
+_predict_pool = ThreadPoolExecutor(max_workers=_PREDICT_THREADS, thread_name_prefix='predict')
+
 class FraudPredictor:
     """ML model for fraud prediction."""
     
     def __init__(self):
         self.model = None
         self.scaler = None
+        self.session = None
+        self._mean = None
+        self._inv_scale = None
+        self._top_features = []
         self.model_loaded = False
+        self._queue = None
         self._load_model()
     
     def _load_model(self):
@@ -25,7 +67,12 @@ class FraudPredictor:
             scaler_path = Path(settings.SCALER_PATH)
             
             if model_path.exists():
+                # Workers share the forest through gunicorn's preload_app copy-on-write;
+                # mmap would not help, since sklearn copies tree arrays while unpickling
                 self.model = joblib.load(model_path)
+                # Trained with n_jobs=-1; a thread pool per small predict costs more than the trees
+                if hasattr(self.model, 'n_jobs'):
+                    self.model.n_jobs = 1
                 logger.info(f"Model loaded from {model_path}")
             else:
                 logger.warning(f"Model file not found: {model_path}")
@@ -38,12 +85,120 @@ class FraudPredictor:
                 logger.warning(f"Scaler file not found: {scaler_path}")
                 self._create_dummy_scaler()
             
+            self._load_onnx_session()
             self.model_loaded = True
             
         except Exception as e:
             logger.error(f"Error loading model: {str(e)}")
             self._create_dummy_model()
             self._create_dummy_scaler()
+        
+        self._cache_scaler_params()
+        self._cache_top_features()
+    
+    def _cache_scaler_params(self):
+        """Precompute the scaler's affine transform so predictions skip sklearn validation."""
+        if self.scaler is None:
+            return
+        
+        n_features = self.scaler.n_features_in_
+        mean = self.scaler.mean_ if self.scaler.mean_ is not None else np.zeros(n_features)
+        scale = self.scaler.scale_ if self.scaler.scale_ is not None else np.ones(n_features)
+        self._mean = np.ascontiguousarray(mean, dtype=np.float32)
+        self._inv_scale = np.ascontiguousarray(1.0 / scale, dtype=np.float32)
+    
+    def _cache_top_features(self):
+        """Rank feature importances once; they are fixed for a loaded model."""
+        if not hasattr(self.model, 'feature_importances_'):
+            self._top_features = []
+            return
+        
+        top_features = sorted(
+            zip(FEATURE_NAMES, self.model.feature_importances_),
+            key=lambda x: x[1],
+            reverse=True
+        )[:5]
+        self._top_features = [
+            {'feature': name, 'importance': float(imp)}
+            for name, imp in top_features
+        ]
+    
+    def _load_onnx_session(self):
+        """
+        Load the fused scaler + model ONNX graph.
+        
+        Uses the exported file when it is at least as new as the joblib files,
+        otherwise converts the loaded model in memory. Any failure leaves the
+        service on the joblib model, which stays loaded for feature importances.
+        """
+        if ort is None:
+            return
+        
+        onnx_path = Path(settings.ONNX_MODEL_PATH)
+        if onnx_path.exists() and not self._onnx_is_stale(onnx_path):
+            source, origin = str(onnx_path), onnx_path
+        else:
+            if onnx_path.exists():
+                logger.warning(f"Ignoring {onnx_path}: older than the joblib model")
+            try:
+                from ml.convert_to_onnx import build_onnx_model
+                source = build_onnx_model(self.model, self.scaler).SerializeToString()
+                origin = "in-memory conversion"
+            except Exception as e:
+                # skl2onnx missing or model not convertible; stay on sklearn
+                logger.warning(f"ONNX conversion skipped: {str(e)}")
+                return
+        
+        sess_options = ort.SessionOptions()
+        # Single-row requests are latency bound; extra threads only add sync overhead
+        sess_options.intra_op_num_threads = 1
+        try:
+            session = ort.InferenceSession(
+                source,
+                sess_options=sess_options,
+                providers=["CPUExecutionProvider"]
+            )
+        except Exception as e:
+            # Corrupt or incompatible graph; the joblib model still serves
+            logger.warning(f"ONNX session not created from {origin}: {str(e)}")
+            return
+        
+        self.session = session
+        self._onnx_input = session.get_inputs()[0].name
+        self._onnx_proba = session.get_outputs()[1].name
+        logger.info(f"ONNX model loaded from {origin}")
+    
+    def _onnx_is_stale(self, onnx_path: Path) -> bool:
+        """True when the model or scaler pickle was written after the ONNX export."""
+        onnx_mtime = onnx_path.stat().st_mtime
+        for path in (Path(settings.MODEL_PATH), Path(settings.SCALER_PATH)):
+            if path.exists() and path.stat().st_mtime > onnx_mtime:
+                return True
+        return False
+    
+    def _predict_proba(self, features: np.ndarray) -> np.ndarray:
+        """Return float32 class probabilities for a matrix of unscaled feature rows."""
+        if self.session is not None:
+            return self.session.run(
+                [self._onnx_proba],
+                {self._onnx_input: np.asarray(features, dtype=np.float32)}
+            )[0]
+        
+        features = np.ascontiguousarray(features, dtype=np.float32)
+        if self._mean is not None:
+            features_scaled = (features - self._mean) * self._inv_scale
+        else:
+            features_scaled = features
+        
+        # Tree traversal releases the GIL, so row chunks run in parallel
+        if len(features_scaled) >= PARALLEL_MIN_ROWS and _PREDICT_THREADS > 1:
+            chunks = np.array_split(features_scaled, _PREDICT_THREADS)
+            proba = np.concatenate(list(_predict_pool.map(self.model.predict_proba, chunks)))
+        else:
+            proba = self.model.predict_proba(features_scaled)
+        
+        # Same dtype as the ONNX session, so both paths score identically downstream
+        return proba.astype(np.float32, copy=False)
     
     def _create_dummy_model(self):
         """Create dummy model for testing (replace with actual trained model)."""
@@ -75,60 +230,100 @@ class FraudPredictor:
         Returns:
             Tuple of (fraud_score, confidence)
         """
+        # Same float32 arithmetic as the batched paths, so every path agrees per row
+        fraud_scores, confidences = self.predict_scores(features)
+        return float(fraud_scores[0]), float(confidences[0])
+    
+    def predict_batch(self, features: np.ndarray) -> List[Tuple[float, float]]:
+        """
+        Predict fraud probability for a matrix of feature rows in one model call.
+        
+        Returns:
+            List of (fraud_score, confidence) in row order
+        """
+        fraud_scores, confidences = self.predict_scores(features)
+        return [(float(score), float(conf)) for score, conf in zip(fraud_scores, confidences)]
+    
+    def predict_scores(self, features: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Predict fraud probability for a matrix of feature rows in one model call.
+        
+        Returns:
+            (fraud_scores, confidences) as float32 arrays in row order
+        """
         if not self.model_loaded:
             raise RuntimeError("Model not loaded")
         
         try:
-            # Scale features
-            if self.scaler:
-                features_scaled = self.scaler.transform(features)
-            else:
-                features_scaled = features
+            fraud_scores = np.ascontiguousarray(self._predict_proba(features)[:, 1])
+            confidences = np.abs(fraud_scores - np.float32(0.5)) * np.float32(2)
             
-            # Get prediction probability
-            fraud_proba = self.model.predict_proba(features_scaled)[0]
-            fraud_score = float(fraud_proba[1])  # Probability of fraud class
-            
-            # Calculate confidence (distance from decision boundary)
-            confidence = abs(fraud_score - 0.5) * 2
-            
-            return fraud_score, confidence
+            return fraud_scores, confidences
             
         except Exception as e:
-            logger.error(f"Prediction error: {str(e)}")
+            logger.error(f"Batch prediction error: {str(e)}")
             raise
     
+    async def predict_async(self, features: np.ndarray) -> Tuple[float, float]:
+        """
+        Predict fraud probability through the micro-batcher.
+        
+        Falls back to a direct prediction in the default executor when the
+        batcher is not running.
+        """
+        loop = asyncio.get_running_loop()
+        if self._queue is None:
+            return await loop.run_in_executor(None, self.predict, features)
+        
+        future = loop.create_future()
+        await self._queue.put((features, future))
+        return await future
+    
+    async def run_batcher(self):
+        """
+        Coalesce predict_async calls arriving within MAX_WAIT_MS into one model call.
+        
+        Runs for the app's lifetime; start it from the lifespan handler.
+        """
+        loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue()
+        
+        try:
+            while True:
+                pending = [await self._queue.get()]
+                deadline = loop.time() + MAX_WAIT_MS / 1000
+                
+                while len(pending) < MAX_BATCH:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        pending.append(await asyncio.wait_for(self._queue.get(), timeout))
+                    except asyncio.TimeoutError:
+                        break
+                
+                matrix = np.vstack([features for features, _ in pending])
+                try:
+                    predictions = await loop.run_in_executor(None, self.predict_batch, matrix)
+                except Exception as e:
+                    for _, future in pending:
+                        if not future.done():
+                            future.set_exception(e)
+                    continue
+                
+                for (_, future), prediction in zip(pending, predictions):
+                    if not future.done():
+                        future.set_result(prediction)
+        finally:
+            self._queue = None
+    
     def predict_with_explanation(self, features: np.ndarray) -> Dict[str, Any]:
         """
         Predict with feature importance explanation.
         """
         fraud_score, confidence = self.predict(features)
         
-        # Get feature importances
-        if hasattr(self.model, 'feature_importances_'):
-            feature_names = [
-                'amount', 'log_amount', 'amount_bin',
-                'hour', 'day_of_week', 'is_weekend', 'is_night', 'day_of_month',
-                'txn_count_1h', 'txn_count_24h', 'txn_amount_24h', 'avg_txn_amount_24h',
-                'merchant_category', 'merchant_risk', 'country', 'is_foreign',
-                'device_risk', 'transaction_type'
-            ]
-            
-            importances = self.model.feature_importances_
-            top_features = sorted(
-                zip(feature_names, importances),
-                key=lambda x: x[1],
-                reverse=True
-            )[:5]
-            
-            explanation = {
-                'top_features': [
-                    {'feature': name, 'importance': float(imp)}
-                    for name, imp in top_features
-                ]
-            }
-        else:
-            explanation = {'top_features': []}
+        explanation = {'top_features': self._top_features}
         
         return {
             'fraud_score': fraud_score,
@@ -1,18 +1,126 @@
 import pandas as pd
 import numpy as np
-from typing import Dict, Any, List
+import calendar
+import hashlib
+import threading
+from bisect import bisect_right
+from typing import Dict, Any, List, Optional, Tuple
 from datetime import datetime, timedelta
 import redis
-from core.config import settings
+from cachetools import TTLCache
+from core.cache import sync_redis_pool
 from core.logging import get_logger
 
 logger = get_logger(__name__)
 
+# Model input column order (must match training)
+FEATURE_ORDER = [
+    'amount', 'log_amount', 'amount_bin',
+    'hour', 'day_of_week', 'is_weekend', 'is_night', 'day_of_month',
+    'txn_count_1h', 'txn_count_24h', 'txn_amount_24h', 'avg_txn_amount_24h',
+    'merchant_category_encoded', 'merchant_risk_score',
+    'country_encoded', 'is_foreign_transaction',
+    'device_risk_score', 'transaction_type_encoded'
+]
+N_FEATURES = len(FEATURE_ORDER)
+
+# Lower bounds of amount bins 1-4 (bin 0 is below 10)
+AMOUNT_BINS = (10.0, 100.0, 1000.0, 10000.0)
+
+MERCHANT_CATEGORY_MAP = {
+    'grocery': 1,
+    'retail': 2,
+    'restaurant': 3,
+    'gas': 4,
+    'online': 5,
+    'travel': 6,
+    'entertainment': 7,
+    'healthcare': 8,
+    'utilities': 9,
+    'unknown': 0
+}
+
+TRANSACTION_TYPE_MAP = {
+    'payment': 1,
+    'transfer': 2,
+    'withdrawal': 3,
+    'deposit': 4,
+    'purchase': 5
+}
+
+HIGH_RISK_COUNTRIES = frozenset({'XX', 'YY', 'ZZ'})  # Replace with actual codes
+
+# Atomically bump the 1h/24h velocity counters, starting each window's TTL on
+# its first transaction, and read the 24h amount: KEYS = 1h, 24h, amount:24h
+VELOCITY_SCRIPT = """
+local count_1h = redis.call('INCR', KEYS[1])
+if count_1h == 1 then redis.call('EXPIRE', KEYS[1], 3600) end
+local count_24h = redis.call('INCR', KEYS[2])
+if count_24h == 1 then redis.call('EXPIRE', KEYS[2], 86400) end
+return {count_1h, count_24h, redis.call('GET', KEYS[3]) or '0'}
+"""
+# Called by SHA with EVALSHA inside the feature pipeline; a redis-py Script object
+# would first send its own SCRIPT EXISTS round trip on every execute
+VELOCITY_SCRIPT_SHA = hashlib.sha1(VELOCITY_SCRIPT.encode()).hexdigest()
+
+# Merchant/device risk scores change rarely; keep them in process for a few minutes
+RISK_CACHE_TTL = 300
+_risk_cache = TTLCache(maxsize=65536, ttl=RISK_CACHE_TTL)
+_risk_cache_lock = threading.Lock()
+_risk_cache_counts = {'hits': 0, 'misses': 0}
+
+def _cached_risk_score(key: str) -> Optional[float]:
+    """Return a cached risk score, or None on a miss."""
+    with _risk_cache_lock:
+        score = _risk_cache.get(key)
+        _risk_cache_counts['hits' if score is not None else 'misses'] += 1
+        return score
+
+def _store_risk_score(key: str, score: float):
+    """Cache a risk score read from Redis."""
+    with _risk_cache_lock:
+        _risk_cache[key] = score
+
+def risk_cache_stats() -> Dict[str, int]:
+    """Hit/miss counts and current size of the in-process risk score cache."""
+    with _risk_cache_lock:
+        return {**_risk_cache_counts, 'size': len(_risk_cache)}
+
+# Month offsets for Sakamoto's day-of-week formula
+_DOW_OFFSETS = (0, 3, 2, 5, 0, 3, 5, 1, 4, 6, 2, 4)
+
+def parse_timestamp_fields(value: Any) -> Tuple[int, int, int]:
+    """
+    Return (hour, weekday, day) for a transaction timestamp.
+    
+    'YYYY-MM-DDTHH:MM:SSZ' strings naming a real date and time are read by slicing;
+    other strings go through datetime.fromisoformat (which rejects invalid dates),
+    and anything that isn't a datetime means now.
+    """
+    if isinstance(value, str):
+        if (len(value) == 20 and value.isascii() and value[4] == value[7] == '-'
+                and value[10] == 'T' and value[13] == value[16] == ':' and value[19] == 'Z'):
+            fields = (value[0:4], value[5:7], value[8:10], value[11:13], value[14:16], value[17:19])
+            if all(field.isdigit() for field in fields):
+                year, month, day, hour, minute, second = map(int, fields)
+                if (year >= 1 and 1 <= month <= 12 and 1 <= day <= calendar.monthrange(year, month)[1]
+                        and hour <= 23 and minute <= 59 and second <= 59):
+                    if month < 3:
+                        year -= 1
+                    sunday_based = (year + year // 4 - year // 100 + year // 400
+                                    + _DOW_OFFSETS[month - 1] + day) % 7
+                    return hour, (sunday_based + 6) % 7, day
+        value = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    elif not isinstance(value, datetime):
+        value = datetime.now()
+    
+    return value.hour, value.weekday(), value.day
+
 class FeatureEngineer:
     """Feature engineering for fraud detection."""
     
     def __init__(self):
-        self.redis_client = redis.from_url(settings.REDIS_URL)
+        self.redis_client = redis.Redis(connection_pool=sync_redis_pool)
     
     def extract_features(self, transaction: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -35,41 +143,23 @@ class FeatureEngineer:
         features['amount_bin'] = self._categorize_amount(features['amount'])
         
         # Temporal features
-        txn_date = transaction.get('transaction_date')
-        if isinstance(txn_date, str):
-            txn_date = datetime.fromisoformat(txn_date.replace('Z', '+00:00'))
-        elif not isinstance(txn_date, datetime):
-            txn_date = datetime.now()
-        
-        features['hour'] = txn_date.hour
-        features['day_of_week'] = txn_date.weekday()
-        features['is_weekend'] = int(txn_date.weekday() >= 5)
-        features['is_night'] = int(txn_date.hour < 6 or txn_date.hour > 22)
-        features['day_of_month'] = txn_date.day
-        
-        # Velocity features (transaction frequency)
-        user_id = transaction.get('user_id')
-        if user_id:
-            velocity_features = self._calculate_velocity_features(user_id)
-            features.update(velocity_features)
+        hour, weekday, day = parse_timestamp_fields(transaction.get('transaction_date'))
+        
+        features['hour'] = hour
+        features['day_of_week'] = weekday
+        features['is_weekend'] = int(weekday >= 5)
+        features['is_night'] = int(hour < 6 or hour > 22)
+        features['day_of_month'] = day
+        
+        # Velocity, merchant, location and device lookups in one pipelined Redis round trip
+        features.update(self._lookup_redis_features([transaction])[0])
         
         # Merchant features
         merchant_category = transaction.get('merchant_category', 'unknown')
         features['merchant_category_encoded'] = self._encode_merchant_category(merchant_category)
-        features['merchant_risk_score'] = self._get_merchant_risk_score(
-            transaction.get('merchant_id', '')
-        )
         
         # Location features
         features['country_encoded'] = self._encode_country(transaction.get('country', ''))
-        features['is_foreign_transaction'] = self._check_foreign_transaction(
-            user_id, transaction.get('country', '')
-        )
-        
-        # Device features
-        features['device_risk_score'] = self._get_device_risk_score(
-            transaction.get('device_id', '')
-        )
         
         # Transaction type encoding
         txn_type = transaction.get('transaction_type', 'payment')
@@ -77,144 +167,239 @@ class FeatureEngineer:
         
         return features
     
+    def extract_features_batch(self, transactions: List[Dict[str, Any]]) -> np.ndarray:
+        """
+        Extract features for several transactions as a (n_samples, n_features) float32 matrix.
+        
+        Same features as extract_features, but the arithmetic and encodings run
+        column-wise and all rows share one Redis pipeline.
+        """
+        df = pd.DataFrame(transactions)
+        n = len(df)
+        
+        features = pd.DataFrame(index=df.index)
+        amount = df['amount'].astype(float).fillna(0)
+        features['amount'] = amount
+        features['log_amount'] = np.log1p(amount)
+        features['amount_bin'] = np.digitize(amount.to_numpy(), AMOUNT_BINS).astype(np.int8)
+        
+        # Temporal features, in each timestamp's own timezone as in extract_features
+        hour, weekday, day = np.array(
+            [parse_timestamp_fields(txn.get('transaction_date')) for txn in transactions],
+            dtype=np.int64
+        ).reshape(n, 3).T
+        features['hour'] = hour
+        features['day_of_week'] = weekday
+        features['is_weekend'] = (weekday >= 5).astype(np.int8)
+        features['is_night'] = ((hour < 6) | (hour > 22)).astype(np.int8)
+        features['day_of_month'] = day
+        
+        # Categorical encodings
+        features['merchant_category_encoded'] = self._encode_column(
+            df, 'merchant_category', MERCHANT_CATEGORY_MAP
+        )
+        country = df['country'].fillna('') if 'country' in df else pd.Series('', index=df.index)
+        features['country_encoded'] = np.where(
+            country.isin(HIGH_RISK_COUNTRIES), 3, np.where(country != '', 1, 0)
+        )
+        features['transaction_type_encoded'] = self._encode_column(
+            df, 'transaction_type', TRANSACTION_TYPE_MAP
+        )
+        
+        # Redis-backed features last, so a malformed batch fails before any counter
+        # is bumped and the per-row fallback doesn't count its transactions twice
+        redis_features = pd.DataFrame(self._lookup_redis_features(transactions), index=df.index)
+        features = features.join(redis_features)
+        
+        return np.ascontiguousarray(
+            features.reindex(columns=FEATURE_ORDER, fill_value=0).fillna(0).to_numpy(dtype=np.float32)
+        )
+    
+    def _encode_column(self, df: pd.DataFrame, column: str, mapping: Dict[str, int]) -> np.ndarray:
+        """Encode a categorical column with mapping; missing or unknown values become 0."""
+        if column not in df:
+            return np.zeros(len(df), dtype=np.int64)
+        values = df[column].fillna('').astype(str).str.lower()
+        return values.map(mapping).fillna(0).astype(np.int64).to_numpy()
+    
     def _categorize_amount(self, amount: float) -> int:
         """Categorize transaction amount into bins."""
-        if amount < 10:
-            return 0
-        elif amount < 100:
-            return 1
-        elif amount < 1000:
-            return 2
-        elif amount < 10000:
-            return 3
-        else:
-            return 4
+        return bisect_right(AMOUNT_BINS, amount)
     
-    def _calculate_velocity_features(self, user_id: str) -> Dict[str, float]:
-        """Calculate transaction velocity features."""
-        cache_key = f"velocity:{user_id}"
+    def _lookup_redis_features(self, transactions: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Fetch velocity, merchant, location and device features for each transaction.
         
+        All commands go out in a single non-transactional pipeline and run in
+        input order, so velocity counters advance exactly as per-row calls would.
+        """
         try:
-            # Get transaction count from Redis
-            txn_count_1h = int(self.redis_client.get(f"{cache_key}:1h") or 0)
-            txn_count_24h = int(self.redis_client.get(f"{cache_key}:24h") or 0)
-            txn_amount_24h = float(self.redis_client.get(f"{cache_key}:amount:24h") or 0)
-            
-            # Increment counters
-            self.redis_client.incr(f"{cache_key}:1h")
-            self.redis_client.expire(f"{cache_key}:1h", 3600)  # 1 hour
-            
-            self.redis_client.incr(f"{cache_key}:24h")
-            self.redis_client.expire(f"{cache_key}:24h", 86400)  # 24 hours
+            pipe, cached = self._queue_pipeline(transactions)
+            try:
+                results = pipe.execute()
+            except redis.exceptions.NoScriptError:
+                # Script not cached yet (first use or a server restart). The EVALSHAs
+                # failed without counting and the other commands are safe to repeat
+                self.redis_client.script_load(VELOCITY_SCRIPT)
+                pipe, cached = self._queue_pipeline(transactions)
+                results = pipe.execute()
+        except Exception as e:
+            logger.error(f"Error fetching Redis features: {str(e)}")
+            return [self._default_redis_features(transaction) for transaction in transactions]
+        
+        results = iter(results)
+        return [
+            self._read_lookups(transaction, cached_scores, results)
+            for transaction, cached_scores in zip(transactions, cached)
+        ]
+    
+    def _queue_pipeline(self, transactions: List[Dict[str, Any]]):
+        """Queue every transaction's lookups on a fresh non-transactional pipeline."""
+        pipe = self.redis_client.pipeline(transaction=False)
+        return pipe, [self._queue_lookups(pipe, transaction) for transaction in transactions]
+    
+    def _queue_lookups(self, pipe, transaction: Dict[str, Any]) -> Dict[str, Optional[float]]:
+        """
+        Queue the Redis commands for one transaction; _read_lookups consumes them in order.
+        
+        Returns the in-process cached risk scores; None means the lookup was queued.
+        """
+        cached = {'merchant': None, 'device': None}
+        user_id = transaction.get('user_id')
+        country = transaction.get('country')
+        
+        if user_id:
+            cache_key = f"velocity:{user_id}"
+            pipe.evalsha(
+                VELOCITY_SCRIPT_SHA, 3,
+                f"{cache_key}:1h", f"{cache_key}:24h", f"{cache_key}:amount:24h"
+            )
+        
+        if transaction.get('merchant_id'):
+            cache_key = f"merchant_risk:{transaction['merchant_id']}"
+            cached['merchant'] = _cached_risk_score(cache_key)
+            if cached['merchant'] is None:
+                pipe.get(cache_key)
+        
+        if user_id and country:
+            # First seen country becomes the home country for 30 days
+            cache_key = f"user_country:{user_id}"
+            pipe.get(cache_key)
+            pipe.set(cache_key, country, ex=86400 * 30, nx=True)
+        
+        if transaction.get('device_id'):
+            cache_key = f"device_risk:{transaction['device_id']}"
+            cached['device'] = _cached_risk_score(cache_key)
+            if cached['device'] is None:
+                pipe.get(cache_key)
+        
+        return cached
+    
+    def _read_lookups(self, transaction: Dict[str, Any], cached: Dict[str, Optional[float]],
+                      results) -> Dict[str, Any]:
+        """Build features for one transaction from its slice of the pipeline results."""
+        user_id = transaction.get('user_id')
+        country = transaction.get('country')
+        features = {}
+        
+        if user_id:
+            # Counters come back post-increment; features use the prior counts
+            count_1h, count_24h, amount_24h = next(results)
+            txn_count_1h = int(count_1h) - 1
+            txn_count_24h = int(count_24h) - 1
+            txn_amount_24h = float(amount_24h)
             
-            return {
+            features.update({
                 'txn_count_1h': txn_count_1h,
                 'txn_count_24h': txn_count_24h,
                 'txn_amount_24h': txn_amount_24h,
                 'avg_txn_amount_24h': txn_amount_24h / max(txn_count_24h, 1)
-            }
-        except Exception as e:
-            logger.error(f"Error calculating velocity features: {str(e)}")
-            return {
+            })
+        
+        # Default neutral risk for unknown merchants
+        if transaction.get('merchant_id'):
+            risk_score = cached['merchant']
+            if risk_score is None:
+                risk_score = next(results)
+                risk_score = float(risk_score) if risk_score else 0.5
+                _store_risk_score(f"merchant_risk:{transaction['merchant_id']}", risk_score)
+            features['merchant_risk_score'] = risk_score
+        else:
+            features['merchant_risk_score'] = 0.5
+        
+        if user_id and country:
+            home_country = next(results)
+            next(results)
+            features['is_foreign_transaction'] = int(
+                bool(home_country) and home_country.decode() != country
+            )
+        else:
+            features['is_foreign_transaction'] = 0
+        
+        # New devices get lower risk
+        if transaction.get('device_id'):
+            risk_score = cached['device']
+            if risk_score is None:
+                risk_score = next(results)
+                risk_score = float(risk_score) if risk_score else 0.3
+                _store_risk_score(f"device_risk:{transaction['device_id']}", risk_score)
+            features['device_risk_score'] = risk_score
+        else:
+            features['device_risk_score'] = 0.5
+        
+        return features
+    
+    def _default_redis_features(self, transaction: Dict[str, Any]) -> Dict[str, Any]:
+        """Features used when Redis is unavailable."""
+        features = {
+            'merchant_risk_score': 0.5,
+            'is_foreign_transaction': 0,
+            'device_risk_score': 0.5
+        }
+        if transaction.get('user_id'):
+            features.update({
                 'txn_count_1h': 0,
                 'txn_count_24h': 0,
                 'txn_amount_24h': 0,
                 'avg_txn_amount_24h': 0
-            }
+            })
+        return features
     
     def _encode_merchant_category(self, category: str) -> int:
         """Encode merchant category."""
-        category_map = {
-            'grocery': 1,
-            'retail': 2,
-            'restaurant': 3,
-            'gas': 4,
-            'online': 5,
-            'travel': 6,
-            'entertainment': 7,
-            'healthcare': 8,
-            'utilities': 9,
-            'unknown': 0
-        }
-        return category_map.get(category.lower(), 0)
-    
-    def _get_merchant_risk_score(self, merchant_id: str) -> float:
-        """Get risk score for merchant (from cache or database)."""
-        if not merchant_id:
-            return 0.5
-        
-        try:
-            cache_key = f"merchant_risk:{merchant_id}"
-            risk_score = self.redis_client.get(cache_key)
-            if risk_score:
-                return float(risk_score)
-            return 0.5  # Default neutral risk
-        except Exception:
-            return 0.5
+        return self._encode_lowercase(MERCHANT_CATEGORY_MAP, category)
     
     def _encode_country(self, country: str) -> int:
         """Encode country code."""
         # High-risk countries get higher values
-        high_risk_countries = ['XX', 'YY', 'ZZ']  # Replace with actual codes
-        if country in high_risk_countries:
+        if country in HIGH_RISK_COUNTRIES:
             return 3
         elif country:
             return 1
         return 0
     
-    def _check_foreign_transaction(self, user_id: str, country: str) -> int:
-        """Check if transaction is from foreign location."""
-        if not user_id or not country:
-            return 0
-        
-        try:
-            cache_key = f"user_country:{user_id}"
-            home_country = self.redis_client.get(cache_key)
-            if home_country:
-                return int(home_country.decode() != country)
-            # Store current country as home country
-            self.redis_client.setex(cache_key, 86400 * 30, country)  # 30 days
-            return 0
-        except Exception:
-            return 0
-    
-    def _get_device_risk_score(self, device_id: str) -> float:
-        """Get risk score for device."""
-        if not device_id:
-            return 0.5
-        
-        try:
-            cache_key = f"device_risk:{device_id}"
-            risk_score = self.redis_client.get(cache_key)
-            if risk_score:
-                return float(risk_score)
-            return 0.3  # New devices get lower risk
-        except Exception:
-            return 0.5
-    
     def _encode_transaction_type(self, txn_type: str) -> int:
         """Encode transaction type."""
-        type_map = {
-            'payment': 1,
-            'transfer': 2,
-            'withdrawal': 3,
-            'deposit': 4,
-            'purchase': 5
-        }
-        return type_map.get(txn_type.lower(), 0)
+        return self._encode_lowercase(TRANSACTION_TYPE_MAP, txn_type)
+    
+    def _encode_lowercase(self, mapping: Dict[str, int], value: Optional[str]) -> int:
+        """Look up value in a lowercase-keyed map, lowercasing only when the direct lookup misses."""
+        code = mapping.get(value)
+        if code is None:
+            code = mapping.get(value.lower(), 0) if value else 0
+        return code
     
     def prepare_model_input(self, features: Dict[str, Any]) -> np.ndarray:
         """Prepare features for model input."""
-        # Define feature order (must match training)
-        feature_order = [
-            'amount', 'log_amount', 'amount_bin',
-            'hour', 'day_of_week', 'is_weekend', 'is_night', 'day_of_month',
-            'txn_count_1h', 'txn_count_24h', 'txn_amount_24h', 'avg_txn_amount_24h',
-            'merchant_category_encoded', 'merchant_risk_score',
-            'country_encoded', 'is_foreign_transaction',
-            'device_risk_score', 'transaction_type_encoded'
-        ]
-        
-        # Extract features in correct order
-        feature_vector = [features.get(f, 0) for f in feature_order]
-        return np.array(feature_vector).reshape(1, -1)
+        # Fill a float32 row directly in the correct order; a fresh array per call,
+        # since the micro-batcher holds inputs until its batch is stacked
+        return np.fromiter(
+            (features.get(f, 0) for f in FEATURE_ORDER), dtype=np.float32, count=N_FEATURES
+        ).reshape(1, N_FEATURES)
+    
+    def prepare_model_matrix(self, features_list: List[Dict[str, Any]]) -> np.ndarray:
+        """Prepare a (n_samples, n_features) model input from several feature dicts."""
+        return np.array(
+            [[features.get(f, 0) for f in FEATURE_ORDER] for features in features_list],
+            dtype=float
+        ).reshape(len(features_list), len(FEATURE_ORDER))
@@ -136,8 +136,9 @@ def train_model():
     model_path = models_dir / "fraud_model.pkl"
     scaler_path = models_dir / "scaler.pkl"
     
-    joblib.dump(model, model_path)
-    joblib.dump(scaler, scaler_path)
+    # Uncompressed for a faster load; workers share the model via preload_app, not mmap
+    joblib.dump(model, model_path, compress=0)
+    joblib.dump(scaler, scaler_path, compress=0)
     
     logger.info(f"Model saved to {model_path}")
     logger.info(f"Scaler saved to {scaler_path}")
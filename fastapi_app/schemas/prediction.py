@@ -37,7 +37,7 @@ class DetailedPredictionResponse(PredictionResponse):
     explanation: Dict[str, Any] = Field(..., description="Feature importance and explanation")
     triggered_rules: List[Dict[str, str]] = Field(default_factory=list, description="Triggered fraud rules")
     
-    class Config:
+    model_config = ConfigDict(
         json_schema_extra = {
             "example": {
                 "fraud_score": 0.85,
@@ -58,6 +58,7 @@ class DetailedPredictionResponse(PredictionResponse):
                 ]
             }
         }
+    )
 
 class HealthResponse(BaseModel):
     """Health check response."""
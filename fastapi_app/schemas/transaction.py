@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field, validator
+from pydantic import BaseModel, Field, ConfigDict, field_validator
 from typing import Optional, Dict, Any
 from datetime import datetime
 
@@ -20,14 +20,15 @@ class TransactionInput(BaseModel):
     city: Optional[str] = Field(None, description="City")
     device_id: Optional[str] = Field(None, description="Device ID")
     
-    transaction_date: Optional[datetime] = Field(None, description="Transaction timestamp")
+    transaction_date: Optional[datetime] = Field(None, validate_default=True, description="Transaction timestamp")
     ml_features: Optional[Dict[str, Any]] = Field(default_factory=dict, description="Additional ML features")
     
-    @validator('transaction_date', pre=True, always=True)
+    @field_validator('transaction_date', mode='before')
+    @classmethod
     def set_transaction_date(cls, v):
         return v or datetime.now()
     
-    class Config:
+    model_config = ConfigDict(
         json_schema_extra = {
             "example": {
                 "user_id": "USER123456",
@@ -45,6 +46,7 @@ class TransactionInput(BaseModel):
                 "transaction_date": "2026-01-21T16:00:00Z"
             }
         }
+    )
 
 class BulkTransactionInput(BaseModel):
     """Schema for bulk transaction processing."""
@@ -1,5 +1,8 @@
+import asyncio
 import time
-from typing import Dict, Any
+from functools import lru_cache
+import numpy as np
+from typing import Dict, Any, List, Optional, Union
 from ml.preprocess import FeatureEngineer
 from ml.predict import FraudPredictor
 from core.config import settings
@@ -7,12 +10,38 @@ from core.logging import get_logger
 
 logger = get_logger(__name__)
 
+# Indexed by the number of risk thresholds a score reaches
+RISK_LEVELS = ("LOW", "MEDIUM", "HIGH", "CRITICAL")
+
+# Rule messages: bound formatters for the parameterised ones, fixed payloads for the rest
+_HIGH_AMOUNT_MESSAGE = 'Amount ${:.2f} exceeds maximum limit'.format
+_HIGH_VELOCITY_MESSAGE = '{} transactions in last hour'.format
+_UNUSUAL_TIME_RULE = {'rule': 'unusual_time', 'message': 'Large transaction during night hours'}
+_FOREIGN_LOCATION_RULE = {'rule': 'foreign_location', 'message': 'Transaction from unusual location'}
+
 class FraudScoringService:
     """Service for fraud scoring operations."""
     
     def __init__(self):
         self.feature_engineer = FeatureEngineer()
         self.predictor = FraudPredictor()
+        self.reload_settings()
+    
+    def reload_settings(self):
+        """Snapshot the thresholds and model version used on every scoring call."""
+        self._t_high = float(settings.FRAUD_THRESHOLD_HIGH)
+        self._t_review = float(settings.FRAUD_THRESHOLD_REVIEW)
+        self._t_med = float(settings.FRAUD_THRESHOLD_MEDIUM)
+        # Both risk level lookups count thresholds reached, which needs them sorted
+        if not self._t_med <= self._t_review <= self._t_high:
+            raise ValueError(
+                "Fraud thresholds must satisfy MEDIUM <= REVIEW <= HIGH, got "
+                f"{self._t_med}, {self._t_review}, {self._t_high}"
+            )
+        self._max_amt = float(settings.MAX_TRANSACTION_AMOUNT)
+        self._model_version = settings.MODEL_VERSION
+        # Lower bounds of MEDIUM, HIGH and CRITICAL, as in _determine_risk_level
+        self._risk_thresholds = np.array([self._t_med, self._t_review, self._t_high])
     
     def score_transaction(self, transaction_data: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -20,7 +49,7 @@ class FraudScoringService:
         
         Returns complete prediction with risk level and recommendation.
         """
-        start_time = time.time()
+        start_ns = time.perf_counter_ns()
         
         try:
             # Extract features
@@ -32,33 +61,115 @@ class FraudScoringService:
             # Get prediction
             fraud_score, confidence = self.predictor.predict(model_input)
             
-            # Determine risk level
-            risk_level = self._determine_risk_level(fraud_score)
+            # Calculate processing time
+            processing_time = (time.perf_counter_ns() - start_ns) / 1e6
             
-            # Generate recommendation
-            recommendation = self._generate_recommendation(fraud_score, risk_level)
+            return self._build_prediction(fraud_score, confidence, processing_time)
             
-            # Calculate processing time
-            processing_time = (time.time() - start_time) * 1000
+        except Exception as e:
+            logger.error(f"Error scoring transaction: {str(e)}")
+            raise
+    
+    async def score_transaction_async(self, transaction_data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Score a single transaction, batching the model call with concurrent requests.
+        
+        Feature extraction does blocking Redis I/O, so it runs in the default executor.
+        """
+        start_ns = time.perf_counter_ns()
+        
+        try:
+            loop = asyncio.get_running_loop()
+            features = await loop.run_in_executor(
+                None, self.feature_engineer.extract_features, transaction_data
+            )
+            model_input = self.feature_engineer.prepare_model_input(features)
             
-            return {
-                'fraud_score': round(fraud_score, 4),
-                'risk_level': risk_level,
-                'confidence': round(confidence, 4),
-                'recommendation': recommendation,
-                'model_version': settings.MODEL_VERSION,
-                'processing_time_ms': round(processing_time, 2)
-            }
+            fraud_score, confidence = await self.predictor.predict_async(model_input)
+            
+            processing_time = (time.perf_counter_ns() - start_ns) / 1e6
+            
+            return self._build_prediction(fraud_score, confidence, processing_time)
             
         except Exception as e:
             logger.error(f"Error scoring transaction: {str(e)}")
             raise
     
+    def score_batch(self, transactions: List[Dict[str, Any]]) -> List[Union[Dict[str, Any], Exception]]:
+        """
+        Score several transactions with a single model call.
+        
+        Features are extracted column-wise for the whole batch. If that fails they
+        are extracted per transaction; rows that fail extraction are returned as
+        their exception, in input order, and the rest are predicted together.
+        Prediction errors propagate.
+        """
+        start_ns = time.perf_counter_ns()
+        results: List[Union[Dict[str, Any], Exception]] = [None] * len(transactions)
+        
+        try:
+            model_input = self.feature_engineer.extract_features_batch(transactions)
+            positions = list(range(len(transactions)))
+        except Exception as e:
+            # Fall back to per-row extraction so one bad row doesn't fail the batch
+            logger.warning(f"Vectorized feature extraction failed, scoring per row: {str(e)}")
+            rows, positions = [], []
+            for i, transaction_data in enumerate(transactions):
+                try:
+                    rows.append(self.feature_engineer.extract_features(transaction_data))
+                    positions.append(i)
+                except Exception as e:
+                    logger.error(f"Error extracting features for user {transaction_data.get('user_id')}: {str(e)}")
+                    results[i] = e
+            model_input = self.feature_engineer.prepare_model_matrix(rows) if rows else None
+        
+        if positions:
+            fraud_scores, confidences = self.predictor.predict_scores(model_input)
+            
+            # Processing time is amortized over the rows scored together
+            processing_time = (time.perf_counter_ns() - start_ns) / 1e6 / len(positions)
+            predictions = self._build_predictions(fraud_scores, confidences, processing_time)
+            for i, prediction in zip(positions, predictions):
+                results[i] = prediction
+        
+        return results
+    
+    def _build_predictions(self, fraud_scores: np.ndarray, confidences: np.ndarray,
+                           processing_time: float) -> List[Dict[str, Any]]:
+        """
+        Assemble payloads for a batch, assigning every risk level in one searchsorted pass.
+        
+        Scores stay float32 until rounding. Thresholds stay float64, matching the
+        scalar comparisons in _determine_risk_level, so a score at a boundary gets
+        the same level on either path.
+        """
+        levels = np.searchsorted(self._risk_thresholds, fraud_scores, side='right')
+        
+        return [
+            self._build_prediction(float(fraud_score), float(confidence), processing_time, RISK_LEVELS[level])
+            for fraud_score, confidence, level in zip(fraud_scores, confidences, levels)
+        ]
+    
+    def _build_prediction(self, fraud_score: float, confidence: float, processing_time: float,
+                          risk_level: Optional[str] = None) -> Dict[str, Any]:
+        """Assemble the prediction payload for a scored transaction."""
+        if risk_level is None:
+            risk_level = self._determine_risk_level(fraud_score)
+        
+        return {
+            'fraud_score': round(fraud_score, 4),
+            'risk_level': risk_level,
+            'confidence': round(confidence, 4),
+            'recommendation': self._generate_recommendation(fraud_score, risk_level),
+            'model_version': self._model_version,
+            'processing_time_ms': round(processing_time, 2)
+        }
+    
     def score_transaction_detailed(self, transaction_data: Dict[str, Any]) -> Dict[str, Any]:
         """
         Score transaction with detailed explanation.
         """
-        start_time = time.time()
+        start_ns = time.perf_counter_ns()
         
         try:
             # Extract features
@@ -84,14 +195,14 @@ class FraudScoringService:
             triggered_rules = self._apply_rules(transaction_data, features)
             
             # Calculate processing time
-            processing_time = (time.time() - start_time) * 1000
+            processing_time = (time.perf_counter_ns() - start_ns) / 1e6
             
             return {
                 'fraud_score': round(fraud_score, 4),
                 'risk_level': risk_level,
                 'confidence': round(confidence, 4),
                 'recommendation': recommendation,
-                'model_version': settings.MODEL_VERSION,
+                'model_version': self._model_version,
                 'processing_time_ms': round(processing_time, 2),
                 'explanation': explanation,
                 'triggered_rules': triggered_rules
@@ -102,14 +213,10 @@ class FraudScoringService:
             raise
     
     def _determine_risk_level(self, fraud_score: float) -> str:
-        """Determine risk level from fraud score."""
-        if fraud_score >= settings.FRAUD_THRESHOLD_HIGH:
-            return "CRITICAL"
-        elif fraud_score >= 0.7:
-            return "HIGH"
-        elif fraud_score >= settings.FRAUD_THRESHOLD_MEDIUM:
-            return "MEDIUM"
-        return "LOW"
+        """Determine risk level from fraud score (count of thresholds reached)."""
+        return RISK_LEVELS[
+            (fraud_score >= self._t_med) + (fraud_score >= self._t_review) + (fraud_score >= self._t_high)
+        ]
     
     def _generate_recommendation(self, fraud_score: float, risk_level: str) -> str:
         """Generate action recommendation."""
@@ -127,10 +234,10 @@ class FraudScoringService:
         
         # Rule 1: High amount
         amount = features.get('amount', 0)
-        if amount > settings.MAX_TRANSACTION_AMOUNT:
+        if amount > self._max_amt:
             triggered_rules.append({
                 'rule': 'high_amount',
-                'message': f'Amount ${amount:.2f} exceeds maximum limit'
+                'message': _HIGH_AMOUNT_MESSAGE(amount)
             })
         
         # Rule 2: High velocity
@@ -138,21 +245,25 @@ class FraudScoringService:
         if txn_count_1h > 10:
             triggered_rules.append({
                 'rule': 'high_velocity',
-                'message': f'{txn_count_1h} transactions in last hour'
+                'message': _HIGH_VELOCITY_MESSAGE(txn_count_1h)
             })
         
         # Rule 3: Night transaction
         if features.get('is_night', 0) == 1 and amount > 5000:
-            triggered_rules.append({
-                'rule': 'unusual_time',
-                'message': 'Large transaction during night hours'
-            })
+            triggered_rules.append(_UNUSUAL_TIME_RULE.copy())
         
         # Rule 4: Foreign transaction
         if features.get('is_foreign_transaction', 0) == 1:
-            triggered_rules.append({
-                'rule': 'foreign_location',
-                'message': 'Transaction from unusual location'
-            })
+            triggered_rules.append(_FOREIGN_LOCATION_RULE.copy())
         
         return triggered_rules
+
+@lru_cache(maxsize=1)
+def get_scoring_service() -> FraudScoringService:
+    """
+    Return the process-wide scoring service.
+    
+    The model is loaded on first use; with gunicorn's preload_app that happens in
+    the master, so workers share it copy-on-write.
+    """
+    return FraudScoringService()
@@ -0,0 +1,92 @@
+"""
+Shared test fixtures.
+"""
+
+from datetime import datetime, timezone
+
+import pytest
+from fastapi.testclient import TestClient
+from main import app
+from services.scoring import get_scoring_service
+
+@pytest.fixture(scope="session")
+def client():
+    """One client for the whole session; the lifespan (model warmup, Redis pool) runs once."""
+    with TestClient(app) as test_client:
+        yield test_client
+
+# Mixed payloads: repeat users, a home-country change, cased categories, both timestamp forms
+BATCH_PAYLOADS = [
+    {"user_id": "PARITY1", "amount": 12.5, "merchant_category": "Grocery", "merchant_id": "M-PARITY-1",
+     "country": "US", "device_id": "D-PARITY-1", "transaction_type": "PAYMENT",
+     "transaction_date": "2024-03-09T23:15:00Z"},
+    {"user_id": "PARITY1", "amount": 2500.0, "merchant_category": "travel", "country": "FR",
+     "transaction_type": "transfer", "transaction_date": datetime(2024, 3, 10, 2, 5, tzinfo=timezone.utc)},
+    {"user_id": "PARITY2", "amount": 0.99, "merchant_category": "unknown-kind", "country": "XX",
+     "transaction_type": "purchase", "transaction_date": "2024-02-29T12:00:00Z"},
+    {"user_id": "PARITY1", "amount": 15000.0, "merchant_id": "M-PARITY-1", "country": "US",
+     "transaction_type": "withdrawal", "transaction_date": datetime(2024, 12, 31, 23, 59)},
+]
+
+REDIS_SEED = {
+    "merchant_risk:M-PARITY-1": b"0.9",
+    "device_risk:D-PARITY-1": b"0.2",
+    "velocity:PARITY2:amount:24h": b"120.5",
+}
+
+@pytest.fixture
+def batch_payloads():
+    """Fresh copies of BATCH_PAYLOADS for one test."""
+    return [dict(txn) for txn in BATCH_PAYLOADS]
+
+class FakePipeline:
+    """In-memory stand-in for the non-transactional pipeline FeatureEngineer uses."""
+    
+    def __init__(self, store):
+        self.store = store
+        self.commands = []
+    
+    def get(self, key):
+        self.commands.append(lambda: self.store.get(key))
+    
+    def set(self, key, value, ex=None, nx=False):
+        def run():
+            if nx and key in self.store:
+                return None
+            self.store[key] = value.encode()
+            return True
+        self.commands.append(run)
+    
+    def evalsha(self, sha, numkeys, *keys):
+        """Same replies as VELOCITY_SCRIPT: post-increment 1h/24h counts and the 24h amount."""
+        def run():
+            counts = []
+            for key in keys[:2]:
+                self.store[key] = self.store.get(key, 0) + 1
+                counts.append(self.store[key])
+            return [*counts, self.store.get(keys[2], b'0')]
+        self.commands.append(run)
+    
+    def execute(self):
+        return [command() for command in self.commands]
+
+class FakeRedis:
+    """Dict-backed Redis client; counters are ints, everything else bytes."""
+    
+    def __init__(self, store=None):
+        self.store = dict(store or {})
+    
+    def pipeline(self, transaction=True):
+        return FakePipeline(self.store)
+
+@pytest.fixture
+def use_fake_redis(monkeypatch):
+    """Return a function that points the shared feature engineer at a fresh, seeded FakeRedis."""
+    engineer = get_scoring_service().feature_engineer
+    
+    def install(store=REDIS_SEED):
+        fake = FakeRedis(store)
+        monkeypatch.setattr(engineer, 'redis_client', fake)
+        return fake
+    
+    return install
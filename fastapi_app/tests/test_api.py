@@ -3,24 +3,20 @@ Basic API tests (expand as needed).
 """
 
 import pytest
-from fastapi.testclient import TestClient
-from main import app
 
-client = TestClient(app)
-
-def test_root():
+def test_root(client):
     """Test root endpoint."""
     response = client.get("/")
     assert response.status_code == 200
     assert "version" in response.json()
 
-def test_health_check():
+def test_health_check(client):
     """Test health endpoint."""
     response = client.get("/api/v1/health")
     assert response.status_code == 200
     assert response.json()["status"] in ["healthy", "degraded", "unhealthy"]
 
-def test_score_transaction():
+def test_score_transaction(client):
     """Test transaction scoring."""
     transaction_data = {
         "user_id": "USER123",
@@ -36,7 +32,7 @@ def test_score_transaction():
     assert "fraud_score" in response.json()
     assert 0 <= response.json()["fraud_score"] <= 1
 
-def test_feature_extraction():
+def test_feature_extraction(client):
     """Test feature extraction."""
     transaction_data = {
         "user_id": "USER123",
@@ -0,0 +1,84 @@
+"""
+Feature engineering tests.
+"""
+
+import random
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pytest
+import redis
+from core.cache import sync_redis_pool
+from ml.preprocess import VELOCITY_SCRIPT, VELOCITY_SCRIPT_SHA, parse_timestamp_fields
+from services.scoring import get_scoring_service
+
+def _random_timestamps(n=2000, seed=7):
+    rng = random.Random(seed)
+    start = datetime(1990, 1, 1, tzinfo=timezone.utc)
+    return [start + timedelta(seconds=rng.randrange(60 * 365 * 86400)) for _ in range(n)]
+
+def test_parse_timestamp_fields_string_matches_datetime():
+    """The sliced 'YYYY-MM-DDTHH:MM:SSZ' path agrees with datetime."""
+    for ts in _random_timestamps():
+        value = ts.strftime('%Y-%m-%dT%H:%M:%SZ')
+        assert parse_timestamp_fields(value) == (ts.hour, ts.weekday(), ts.day)
+
+def test_parse_timestamp_fields_datetime_input():
+    """datetime objects, as handed over by the request model, are read directly."""
+    for ts in _random_timestamps():
+        assert parse_timestamp_fields(ts) == (ts.hour, ts.weekday(), ts.day)
+
+@pytest.mark.parametrize("value", [
+    "2024-13-45T99:00:00Z",
+    "2024-00-10T10:00:00Z",
+    "2024-05-10T24:00:00Z",
+    "2024-05-00T10:00:00Z",
+    "2024-02-31T10:00:00Z",
+    "2023-02-29T10:00:00Z",
+    "2024-05-10T10:61:00Z",
+])
+def test_parse_timestamp_fields_rejects_out_of_range(value):
+    """Out-of-range fields fall through to fromisoformat, which rejects them."""
+    with pytest.raises(ValueError):
+        parse_timestamp_fields(value)
+
+def test_batch_features_match_per_row(use_fake_redis, batch_payloads):
+    """extract_features_batch builds the same matrix, and the same Redis state, as per-row calls."""
+    engineer = get_scoring_service().feature_engineer
+    
+    row_redis = use_fake_redis()
+    per_row = engineer.prepare_model_matrix([engineer.extract_features(txn) for txn in batch_payloads])
+    
+    batch_redis = use_fake_redis()
+    batch = engineer.extract_features_batch(batch_payloads)
+    
+    assert batch.dtype == np.float32
+    np.testing.assert_allclose(batch, per_row.astype(np.float32), rtol=1e-6)
+    assert batch_redis.store == row_redis.store
+
+@pytest.fixture
+def redis_client():
+    client = redis.Redis(connection_pool=sync_redis_pool)
+    try:
+        client.ping()
+    except redis.exceptions.ConnectionError:
+        pytest.skip("Redis not available")
+    return client
+
+def test_velocity_script(redis_client):
+    """The script counts both windows, sets each TTL only on first use and reads the amount."""
+    keys = [f"velocity:LUATEST:{suffix}" for suffix in ("1h", "24h", "amount:24h")]
+    redis_client.delete(*keys)
+    assert redis_client.script_load(VELOCITY_SCRIPT) == VELOCITY_SCRIPT_SHA
+    
+    try:
+        assert redis_client.evalsha(VELOCITY_SCRIPT_SHA, 3, *keys) == [1, 1, b"0"]
+        assert 0 < redis_client.ttl(keys[0]) <= 3600
+        assert 3600 < redis_client.ttl(keys[1]) <= 86400
+        
+        redis_client.expire(keys[0], 100)
+        redis_client.set(keys[2], "250.5")
+        assert redis_client.evalsha(VELOCITY_SCRIPT_SHA, 3, *keys) == [2, 2, b"250.5"]
+        assert redis_client.ttl(keys[0]) <= 100
+    finally:
+        redis_client.delete(*keys)
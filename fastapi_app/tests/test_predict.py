@@ -0,0 +1,52 @@
+"""
+Micro-batcher tests.
+"""
+
+import asyncio
+
+import numpy as np
+import pytest
+from ml.predict import FraudPredictor, MAX_BATCH
+from ml.preprocess import N_FEATURES
+
+@pytest.fixture
+def predictor(monkeypatch):
+    """A separate predictor (the app's runs its own batcher) recording each batch size."""
+    predictor = FraudPredictor()
+    predictor.batch_sizes = []
+    
+    def predict_batch(matrix):
+        predictor.batch_sizes.append(len(matrix))
+        return [(float(row[0]), 1.0) for row in matrix]
+    monkeypatch.setattr(predictor, 'predict_batch', predict_batch)
+    
+    return predictor
+
+def _predict_through_batcher(predictor, n_rows):
+    """Submit n_rows concurrent predict_async calls; row i carries the value i."""
+    async def run():
+        batcher = asyncio.create_task(predictor.run_batcher())
+        await asyncio.sleep(0)
+        try:
+            return await asyncio.gather(*(
+                predictor.predict_async(np.full((1, N_FEATURES), i, dtype=np.float32))
+                for i in range(n_rows)
+            ))
+        finally:
+            batcher.cancel()
+    
+    return asyncio.run(run())
+
+def test_batcher_flushes_on_size(predictor):
+    """A full batch goes out at once; the remainder follows in the next one."""
+    results = _predict_through_batcher(predictor, MAX_BATCH + 1)
+    
+    assert predictor.batch_sizes == [MAX_BATCH, 1]
+    assert [score for score, _ in results] == list(range(MAX_BATCH + 1))
+
+def test_batcher_flushes_on_timeout(predictor):
+    """A lone request is predicted once MAX_WAIT_MS passes without company."""
+    results = _predict_through_batcher(predictor, 1)
+    
+    assert predictor.batch_sizes == [1]
+    assert results == [(0.0, 1.0)]
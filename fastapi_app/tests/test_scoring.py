@@ -0,0 +1,47 @@
+"""
+Scoring service tests.
+"""
+
+import pytest
+from services.scoring import get_scoring_service
+
+def test_score_batch_matches_per_row(use_fake_redis, batch_payloads):
+    """score_batch gives each transaction the score and risk level it gets on its own."""
+    service = get_scoring_service()
+    
+    use_fake_redis()
+    per_row = [service.score_transaction(txn) for txn in batch_payloads]
+    
+    use_fake_redis()
+    batch = service.score_batch(batch_payloads)
+    
+    for single, batched in zip(per_row, batch):
+        assert batched['fraud_score'] == single['fraud_score']
+        assert batched['risk_level'] == single['risk_level']
+
+def test_score_batch_falls_back_per_row(use_fake_redis, batch_payloads):
+    """A malformed row fails alone, and velocity counters advance once per scored row."""
+    service = get_scoring_service()
+    fake = use_fake_redis()
+    bad_row = {"user_id": "PARITY3", "amount": "not-a-number", "country": "US"}
+    
+    results = service.score_batch(batch_payloads[:2] + [bad_row] + batch_payloads[2:])
+    
+    assert isinstance(results[2], ValueError)
+    assert all(isinstance(result, dict) for i, result in enumerate(results) if i != 2)
+    assert fake.store["velocity:PARITY1:1h"] == 3
+    assert fake.store["velocity:PARITY2:1h"] == 1
+    assert "velocity:PARITY3:1h" not in fake.store
+
+def test_score_batch_prediction_error_propagates(use_fake_redis, batch_payloads, monkeypatch):
+    """Model errors are raised, not retried through per-row feature extraction."""
+    service = get_scoring_service()
+    fake = use_fake_redis()
+    
+    def fail(features):
+        raise RuntimeError("model failure")
+    monkeypatch.setattr(service.predictor, 'predict_scores', fail)
+    
+    with pytest.raises(RuntimeError):
+        service.score_batch(batch_payloads)
+    assert fake.store["velocity:PARITY1:1h"] == 3
@@ -17,6 +17,7 @@ celery_app.conf.update(
     result_serializer='json',
     timezone='UTC',
     enable_utc=True,
+    broker_pool_limit=20,  # Reuse broker connections across sends
 )
 
 def trigger_django_task(task_name: str, *args, **kwargs):
@@ -32,6 +32,11 @@ services:
       gunicorn core.wsgi:application
       --bind 0.0.0.0:8000
       --workers ${GUNICORN_WORKERS:-3}
+      --worker-class gthread
+      --threads ${GUNICORN_THREADS:-4}
+      --preload
+      --max-requests 10000
+      --max-requests-jitter 500
     volumes:
       - ./django_app:/app
       - static_volume:/app/staticfiles
@@ -87,9 +92,9 @@ services:
       dockerfile: Dockerfile
     container_name: fraud_fastapi
     command: >
-      uvicorn main:app
-      --host 0.0.0.0
-      --port 8001
+      gunicorn main:app
+      -c gunicorn.conf.py
+      --workers ${UVICORN_WORKERS:-4}
     env_file:
       - .env
     depends_on: